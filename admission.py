@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, fields
+from typing import AsyncIterator, Dict, List, Tuple
+
+KEY_SOURCES = ("ip", "api_key")
+REJECT_REASONS = ("rate", "queue_full", "queue_timeout")
+
+# Client states that have been idle this long (and hold a full bucket) are
+# forgotten so one-off clients don't accumulate.
+IDLE_STATE_SECONDS = 300.0
+
+
+@dataclass
+class AdmissionRule:
+    """Limits for every request whose path starts with ``prefix``.
+
+    ``rate`` tokens per second refill a bucket of ``burst`` tokens and each
+    request takes one; ``concurrency`` caps in-flight requests per client and
+    ``total_concurrency`` across all clients (0 disables either). Up to
+    ``queue`` requests per client wait at most ``queue_timeout`` seconds for a
+    token or a slot before being rejected.
+    """
+
+    prefix: str
+    rate: float = 0.0
+    burst: int = 1
+    concurrency: int = 0
+    total_concurrency: int = 0
+    queue: int = 0
+    queue_timeout: float = 0.0
+    key: str = "ip"
+
+    def __post_init__(self) -> None:
+        if self.key not in KEY_SOURCES:
+            raise ValueError(f"admission rule {self.prefix!r}: key must be one of {KEY_SOURCES}")
+        if self.rate < 0 or self.burst < 1:
+            raise ValueError(f"admission rule {self.prefix!r}: need rate >= 0 and burst >= 1")
+
+
+def parse_rules(raw: str) -> List[AdmissionRule]:
+    known = {f.name for f in fields(AdmissionRule)}
+    rules = []
+    for item in json.loads(raw):
+        unknown = set(item) - known
+        if unknown:
+            raise ValueError(f"unknown admission rule fields: {sorted(unknown)}")
+        rules.append(AdmissionRule(**item))
+    return rules
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token, possibly one that refills in the future, and return
+        how many seconds until it is actually available."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def refund(self) -> None:
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def wait_for_token(self) -> float:
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    @property
+    def full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+@dataclass
+class ClientState:
+    bucket: TokenBucket | None
+    slots: asyncio.Semaphore | None
+    waiting: int = 0
+    active: int = 0
+    last_seen: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class RuleCounters:
+    admitted: int = 0
+    queued: int = 0
+    rejected: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(REJECT_REASONS, 0))
+    active: int = 0
+    waiting: int = 0
+
+
+class RuleLimiter:
+    def __init__(self, rule: AdmissionRule):
+        self.rule = rule
+        self.clients: Dict[str, ClientState] = {}
+        self.counters = RuleCounters()
+        self._total_slots = (
+            asyncio.Semaphore(rule.total_concurrency) if rule.total_concurrency else None
+        )
+        self._last_sweep = time.monotonic()
+
+    def _client(self, key: str) -> ClientState:
+        state = self.clients.get(key)
+        if state is None:
+            rule = self.rule
+            state = self.clients[key] = ClientState(
+                bucket=TokenBucket(rule.rate, rule.burst) if rule.rate else None,
+                slots=asyncio.Semaphore(rule.concurrency) if rule.concurrency else None,
+            )
+        state.last_seen = time.monotonic()
+        return state
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < IDLE_STATE_SECONDS:
+            return
+        self._last_sweep = now
+        for key, state in list(self.clients.items()):
+            if (
+                not state.active
+                and not state.waiting
+                and now - state.last_seen > IDLE_STATE_SECONDS
+                and (state.bucket is None or state.bucket.full)
+            ):
+                del self.clients[key]
+
+    def _reject(self, reason: str, retry_after: float) -> Rejected:
+        self.counters.rejected[reason] += 1
+        return Rejected(reason, retry_after)
+
+    @asynccontextmanager
+    async def admit(self, key: str) -> AsyncIterator[None]:
+        """Hold an admission for ``key`` for the duration of the block, or
+        raise Rejected."""
+        rule = self.rule
+        self._sweep()
+        state = self._client(key)
+        deadline = time.monotonic() + rule.queue_timeout
+
+        if state.bucket is not None:
+            wait = state.bucket.wait_for_token()
+            if wait > rule.queue_timeout:
+                raise self._reject("rate", wait)
+
+        must_wait = (state.bucket is not None and state.bucket.wait_for_token() > 0) or any(
+            slots is not None and slots.locked() for slots in (state.slots, self._total_slots)
+        )
+        if must_wait and state.waiting >= rule.queue:
+            wait = state.bucket.wait_for_token() if state.bucket is not None else 0.0
+            raise self._reject("queue_full", max(wait, rule.queue_timeout, 1.0))
+
+        acquired: List[asyncio.Semaphore] = []
+        if must_wait:
+            state.waiting += 1
+            self.counters.waiting += 1
+            self.counters.queued += 1
+        try:
+            if state.bucket is not None:
+                delay = state.bucket.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+            for slots in (state.slots, self._total_slots):
+                if slots is None:
+                    continue
+                remaining = deadline - time.monotonic()
+                try:
+                    await asyncio.wait_for(slots.acquire(), timeout=max(remaining, 0.0))
+                except asyncio.TimeoutError:
+                    if state.bucket is not None:
+                        state.bucket.refund()
+                    raise self._reject("queue_timeout", rule.queue_timeout or 1.0) from None
+                acquired.append(slots)
+        except BaseException:
+            for slots in acquired:
+                slots.release()
+            raise
+        finally:
+            if must_wait:
+                state.waiting -= 1
+                self.counters.waiting -= 1
+
+        state.active += 1
+        self.counters.active += 1
+        self.counters.admitted += 1
+        try:
+            yield
+        finally:
+            state.active -= 1
+            self.counters.active -= 1
+            state.last_seen = time.monotonic()
+            for slots in acquired:
+                slots.release()
+
+
+class AdmissionController:
+    def __init__(self, rules: List[AdmissionRule]):
+        # Longest prefix first so the most specific rule wins.
+        self.limiters = [
+            RuleLimiter(rule) for rule in sorted(rules, key=lambda rule: len(rule.prefix), reverse=True)
+        ]
+
+    def __bool__(self) -> bool:
+        return bool(self.limiters)
+
+    def match(self, path: str) -> RuleLimiter | None:
+        for limiter in self.limiters:
+            if path.startswith(limiter.rule.prefix):
+                return limiter
+        return None
+
+    def counters(self) -> List[Tuple[str, RuleCounters]]:
+        return [(limiter.rule.prefix, limiter.counters) for limiter in self.limiters]
@@ -1,21 +1,69 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
 import os
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
 
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
-from github_push import GithubPushError, PushResult, push_metadata_to_github, unwrap_metadata, validate_github_username
+from github_batch import (
+    PUSH_BATCH_MAX_ITEMS,
+    BatchItemResult,
+    push_metadata_batch_to_github_async,
+)
+from github_client import close_client
+from github_push import (
+    PUSH_COALESCE_SECONDS,
+    GithubPushError,
+    PushResult,
+    push_metadata_idempotent_async,
+    push_progress,
+    unwrap_metadata,
+    validate_github_username_async,
+)
+from push_jobs import PushJob, PushJobQueue, PushJobStore
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# With `Prefer: respond-async` (or always, when this is set) /push-metadata
+# queues the push and answers 202 with a job to poll at /jobs/{id}.
+PUSH_METADATA_ASYNC = os.getenv("PUSH_METADATA_ASYNC", "0") == "1"
+
+# An Accept of one of these turns /push-metadata into a stream of progress
+# events (NDJSON lines or server-sent events) ending with the result.
+STREAM_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
+# While GitHub is slow the stream sends a heartbeat this often so clients and
+# proxies don't time the connection out.
+STREAM_HEARTBEAT_SECONDS = 10.0
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.push_jobs = PushJobQueue(PushJobStore())
+    await app.state.push_jobs.start()
+    try:
+        yield
+    finally:
+        await app.state.push_jobs.stop()
+        await close_client()
+
+
 app = FastAPI(
     title="Masader Form API",
     description="Push dataset metadata to the Masader GitHub catalogue.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -39,6 +87,54 @@ class PushMetadataResponse(BaseModel):
     message: Optional[str] = None
 
 
+class PushMetadataBatchRequest(BaseModel):
+    github_username: str = Field(..., min_length=1, description="GitHub username for PR attribution")
+    items: List[dict] = Field(
+        ...,
+        min_length=1,
+        max_length=PUSH_BATCH_MAX_ITEMS,
+        description="Dataset metadata objects (each must include Name)",
+    )
+    single_pr: bool = Field(
+        False, description="Commit every item to one branch and open a single PR"
+    )
+
+
+class PushMetadataBatchItem(BaseModel):
+    index: int
+    name: str
+    status: str = Field(..., description="created, updated, unchanged or failed")
+    branch: Optional[str] = None
+    pull_request_url: Optional[str] = None
+    message: Optional[str] = None
+    error_status: Optional[int] = None
+
+
+class PushMetadataBatchResponse(BaseModel):
+    items: List[PushMetadataBatchItem]
+
+
+class PushJobAccepted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+
+class PushJobStatus(BaseModel):
+    id: str
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    stage: str = Field(
+        ...,
+        description="queued, pushing, state_read, branch_ready, committed, pr_opened, retrying or done",
+    )
+    attempts: int
+    created_at: float
+    updated_at: float
+    result: Optional[PushMetadataResponse] = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+
+
 def require_api_key(x_api_key: Optional[str] = Header(default=None)) -> None:
     expected = (os.getenv("API_KEY") or "").strip()
     if not expected:
@@ -56,6 +152,116 @@ def to_response(result: PushResult) -> PushMetadataResponse:
     )
 
 
+def to_batch_item(item: BatchItemResult) -> PushMetadataBatchItem:
+    if item.result is None:
+        return PushMetadataBatchItem(
+            index=item.index,
+            name=item.name,
+            status="failed",
+            message=item.error,
+            error_status=item.status_code,
+        )
+    return PushMetadataBatchItem(
+        index=item.index,
+        name=item.name,
+        status=item.result.status,
+        branch=item.result.branch,
+        pull_request_url=item.result.pull_request_url,
+        message=item.result.message,
+    )
+
+
+def to_job_status(job: PushJob) -> PushJobStatus:
+    result = job.push_result
+    return PushJobStatus(
+        id=job.id,
+        status=job.status,
+        stage=job.stage,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        result=to_response(result) if result is not None else None,
+        error=job.error,
+        error_status=job.error_status,
+    )
+
+
+def wants_async(prefer: Optional[str]) -> bool:
+    return PUSH_METADATA_ASYNC or any(
+        token.strip().lower() == "respond-async" for token in (prefer or "").split(",")
+    )
+
+
+def stream_media_type(accept: Optional[str]) -> Optional[str]:
+    for part in (accept or "").split(","):
+        media_type = part.split(";", 1)[0].strip().lower()
+        if media_type in STREAM_MEDIA_TYPES:
+            return media_type
+    return None
+
+
+class PushProgress:
+    """Collects push stages as events timed from the start of the request."""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.last = started
+        self.events: asyncio.Queue = asyncio.Queue()
+
+    def emit(self, stage: str, **details: Any) -> None:
+        now = time.perf_counter()
+        self.events.put_nowait(
+            {
+                "event": stage,
+                "elapsed_ms": round((now - self.started) * 1000, 1),
+                "stage_ms": round((now - self.last) * 1000, 1),
+                **details,
+            }
+        )
+        self.last = now
+
+    def close(self) -> None:
+        self.events.put_nowait(None)
+
+
+def format_event(event: dict, media_type: str) -> str:
+    if media_type == "text/event-stream":
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+
+async def stream_push(
+    run: Callable[[], Awaitable[PushResult]], progress: PushProgress, media_type: str
+) -> AsyncIterator[str]:
+    async def push() -> None:
+        try:
+            with push_progress(progress.emit):
+                result = await run()
+        except GithubPushError as exc:
+            progress.emit("error", status_code=exc.status_code, detail=exc.message)
+        except Exception:
+            logger.exception("Streaming push failed")
+            progress.emit("error", status_code=500, detail="Internal Server Error")
+        else:
+            progress.emit("result", **jsonable_encoder(to_response(result)))
+        finally:
+            progress.close()
+
+    task = asyncio.ensure_future(push())
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(progress.events.get(), STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                event = {"event": "heartbeat"}
+            if event is None:
+                return
+            yield format_event(event, media_type)
+    finally:
+        # The push itself is shielded and still completes if the client left.
+        task.cancel()
+
+
 @app.get("/health")
 def health() -> dict[str, str]:
     return {"status": "ok"}
@@ -64,11 +270,22 @@ def health() -> dict[str, str]:
 @app.post(
     "/push-metadata",
     response_model=PushMetadataResponse,
+    responses={
+        200: {"content": {media_type: {} for media_type in STREAM_MEDIA_TYPES}},
+        202: {"model": PushJobAccepted},
+    },
     dependencies=[Depends(require_api_key)],
 )
-def push_metadata(body: PushMetadataRequest) -> PushMetadataResponse:
+async def push_metadata(
+    body: PushMetadataRequest,
+    request: Request,
+    prefer: Optional[str] = Header(default=None),
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    accept: Optional[str] = Header(default=None),
+):
+    started = time.perf_counter()
     github_username = body.github_username.strip()
-    validation = validate_github_username(github_username)
+    validation = await validate_github_username_async(github_username)
     if not validation.ok:
         raise HTTPException(status_code=validation.status_code, detail=validation.error)
 
@@ -76,9 +293,72 @@ def push_metadata(body: PushMetadataRequest) -> PushMetadataResponse:
     if not (metadata.get("Name") or "").strip():
         raise HTTPException(status_code=400, detail="metadata must include a non-empty 'Name' field.")
 
+    if wants_async(prefer):
+        try:
+            job = request.app.state.push_jobs.submit(metadata, github_username, idempotency_key)
+        except GithubPushError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=exc.message) from exc
+        status_url = f"/jobs/{job.id}"
+        return JSONResponse(
+            jsonable_encoder(PushJobAccepted(job_id=job.id, status=job.status, status_url=status_url)),
+            status_code=202,
+            headers={"Location": status_url, "Preference-Applied": "respond-async"},
+        )
+
+    def run() -> Awaitable[PushResult]:
+        return push_metadata_idempotent_async(
+            metadata,
+            github_username,
+            idempotency_key=idempotency_key,
+            coalesce_seconds=PUSH_COALESCE_SECONDS,
+        )
+
+    media_type = stream_media_type(accept)
+    if media_type is not None:
+        progress = PushProgress(started)
+        progress.emit("validated")
+        return StreamingResponse(
+            stream_push(run, progress, media_type),
+            media_type=media_type,
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     try:
-        result = push_metadata_to_github(metadata, github_username)
+        result = await run()
     except GithubPushError as exc:
         raise HTTPException(status_code=exc.status_code, detail=exc.message) from exc
 
     return to_response(result)
+
+
+@app.post(
+    "/push-metadata/batch",
+    response_model=PushMetadataBatchResponse,
+    dependencies=[Depends(require_api_key)],
+)
+async def push_metadata_batch(body: PushMetadataBatchRequest) -> PushMetadataBatchResponse:
+    github_username = body.github_username.strip()
+    validation = await validate_github_username_async(github_username)
+    if not validation.ok:
+        raise HTTPException(status_code=validation.status_code, detail=validation.error)
+
+    try:
+        results = await push_metadata_batch_to_github_async(
+            body.items, github_username, single_pr=body.single_pr
+        )
+    except GithubPushError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.message) from exc
+
+    return PushMetadataBatchResponse(items=[to_batch_item(item) for item in results])
+
+
+@app.get(
+    "/jobs/{job_id}",
+    response_model=PushJobStatus,
+    dependencies=[Depends(require_api_key)],
+)
+def get_push_job(job_id: str, request: Request) -> PushJobStatus:
+    job = request.app.state.push_jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    return to_job_status(job)
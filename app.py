@@ -8,6 +8,7 @@ import os
 from pathlib import Path
 from datetime import date
 from constants import *
+from github_auth import GithubAuthConfigError, load_auth_config
 from github_push import GithubPushError, load_github_credentials, push_metadata_to_github, validate_github_username
 import streamlit_tags
 from streamlit_tags import st_tags
@@ -602,12 +603,18 @@ def render_submit_status() -> None:
 
 
 def github_credentials_ok() -> bool:
-    token, user_name, user_email = load_github_credentials()
-    if not token:
+    _, user_name, user_email = load_github_credentials()
+    try:
+        configured = load_auth_config().configured
+    except GithubAuthConfigError as exc:
+        notify("error", f"{exc} Fix it in `.env`, then restart Streamlit.")
+        return False
+    if not configured:
         notify(
             "error",
-            "GITHUB_TOKEN is not set. Add it to `.env` in the project root "
-            "(see https://github.com/settings/tokens), then restart Streamlit.",
+            "No GitHub credentials are set. Add GITHUB_TOKEN (see "
+            "https://github.com/settings/tokens) or GitHub App settings to `.env` "
+            "in the project root, then restart Streamlit.",
         )
         return False
     if not user_name or not user_email:
@@ -0,0 +1,464 @@
+"""Benchmark the proxy against in-memory stub backends.
+
+Starts bench/stub_backend.py as both the API and the Streamlit backend,
+runs proxy:app in front of it and measures latency percentiles,
+throughput and the proxy's memory for each scenario:
+
+    small_get      many concurrent small GETs
+    large_stream   large streamed responses
+    large_upload   large streamed request bodies
+    ws_echo        long-lived WebSockets echoing small frames
+
+    python bench/run.py                          # all scenarios, TCP backends
+    python bench/run.py --transport unix --baseline
+    python bench/run.py small_get --scale 0.2 --output before.json
+    python bench/run.py --compare before.json after.json
+
+--baseline repeats each scenario straight against the stub so the proxy's
+overhead can be read off. Results are written as JSON (bench/results/ by
+default).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List
+
+import httpx
+import websockets
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+MB = 1024 * 1024
+UPLOAD_CHUNK = b"u" * (64 * 1024)
+
+SCENARIOS = ("small_get", "large_stream", "large_upload", "ws_echo")
+
+# Everything that would shape or short-circuit the traffic is switched off so
+# the numbers are comparable across runs.
+PROXY_ENV = {
+    "PROXY_ADMISSION_RULES": "[]",
+    "PROXY_PRECOMPRESS_ASSETS": "0",
+    "PROXY_READINESS_GATE": "0",
+    "PROXY_INPROCESS_API": "0",
+}
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    target: str
+    operations: int
+    errors: int
+    seconds: float
+    ops_per_second: float
+    mb_per_second: float
+    latency_ms: Dict[str, float]
+    proxy_rss_mb: Dict[str, float] = field(default_factory=dict)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "p50": round(at(0.50), 3),
+        "p95": round(at(0.95), 3),
+        "p99": round(at(0.99), 3),
+        "max": round(ordered[-1] * 1000, 3),
+        "mean": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def rss_mb(pid: int) -> Dict[str, float]:
+    """Current and peak resident memory of ``pid`` (Linux only)."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                name, _, rest = line.partition(":")
+                if name in ("VmRSS", "VmHWM"):
+                    values[name] = int(rest.split()[0]) / 1024
+    except OSError:
+        return {}
+    return values
+
+
+class MemorySampler:
+    def __init__(self, pid: int | None, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            current = rss_mb(self.pid).get("VmRSS")
+            if current is not None:
+                self.samples.append(current)
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self) -> MemorySampler:
+        if self.pid is not None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {}
+        return {
+            "start": round(self.samples[0], 1),
+            "peak": round(max(self.samples), 1),
+            "end": round(self.samples[-1], 1),
+            "process_peak": round(rss_mb(self.pid).get("VmHWM", 0.0), 1),
+        }
+
+
+@dataclass
+class Endpoint:
+    """Where the load generator sends traffic: the proxy or the stub."""
+
+    name: str
+    base_url: str
+    ws_url: str
+    socket_path: str | None = None
+
+    def http_client(self, concurrency: int) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        transport = httpx.AsyncHTTPTransport(uds=self.socket_path, limits=limits)
+        return httpx.AsyncClient(
+            base_url=self.base_url, transport=transport, timeout=httpx.Timeout(120.0)
+        )
+
+    def ws_connect(self, path: str):
+        if self.socket_path is not None:
+            return websockets.unix_connect(self.socket_path, f"{self.ws_url}{path}", max_size=None)
+        return websockets.connect(f"{self.ws_url}{path}", max_size=None)
+
+
+async def run_requests(total: int, concurrency: int, operation) -> tuple[List[float], int, float]:
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for index in range(total):
+        queue.put_nowait(index)
+
+    async def worker() -> None:
+        nonlocal errors
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                await operation()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def result(
+    scenario: str,
+    endpoint: Endpoint,
+    latencies: List[float],
+    errors: int,
+    seconds: float,
+    transferred: int,
+    memory: MemorySampler,
+) -> ScenarioResult:
+    return ScenarioResult(
+        scenario=scenario,
+        target=endpoint.name,
+        operations=len(latencies),
+        errors=errors,
+        seconds=round(seconds, 3),
+        ops_per_second=round(len(latencies) / seconds, 1) if seconds else 0.0,
+        mb_per_second=round(transferred / MB / seconds, 1) if seconds else 0.0,
+        latency_ms=percentiles(latencies),
+        proxy_rss_mb=memory.summary(),
+    )
+
+
+async def small_get(endpoint: Endpoint, scale: float, memory: MemorySampler) -> ScenarioResult:
+    total, concurrency = max(1, int(5000 * scale)), 32
+    async with endpoint.http_client(concurrency) as client:
+        transferred = 0
+
+        async def operation() -> None:
+            nonlocal transferred
+            response = await client.get("/small")
+            response.raise_for_status()
+            transferred += len(response.content)
+
+        with memory:
+            latencies, errors, seconds = await run_requests(total, concurrency, operation)
+    return result("small_get", endpoint, latencies, errors, seconds, transferred, memory)
+
+
+async def large_stream(endpoint: Endpoint, scale: float, memory: MemorySampler) -> ScenarioResult:
+    total, concurrency, size = max(1, int(60 * scale)), 4, 32 * MB
+    async with endpoint.http_client(concurrency) as client:
+        transferred = 0
+
+        async def operation() -> None:
+            nonlocal transferred
+            async with client.stream("GET", "/large", params={"bytes": size}) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_raw():
+                    transferred += len(chunk)
+
+        with memory:
+            latencies, errors, seconds = await run_requests(total, concurrency, operation)
+    return result("large_stream", endpoint, latencies, errors, seconds, transferred, memory)
+
+
+async def large_upload(endpoint: Endpoint, scale: float, memory: MemorySampler) -> ScenarioResult:
+    total, concurrency, size = max(1, int(60 * scale)), 4, 32 * MB
+    async with endpoint.http_client(concurrency) as client:
+        transferred = 0
+
+        async def body() -> AsyncIterator[bytes]:
+            for _ in range(size // len(UPLOAD_CHUNK)):
+                yield UPLOAD_CHUNK
+
+        async def operation() -> None:
+            nonlocal transferred
+            response = await client.post("/upload", content=body())
+            response.raise_for_status()
+            transferred += response.json()["received"]
+
+        with memory:
+            latencies, errors, seconds = await run_requests(total, concurrency, operation)
+    return result("large_upload", endpoint, latencies, errors, seconds, transferred, memory)
+
+
+async def ws_echo(endpoint: Endpoint, scale: float, memory: MemorySampler) -> ScenarioResult:
+    connections, messages = 100, max(1, int(200 * scale))
+    frame = "m" * 1024
+    latencies: List[float] = []
+    errors = 0
+
+    async def session() -> None:
+        nonlocal errors
+        try:
+            async with endpoint.ws_connect("/_stcore/stream") as ws:
+                for _ in range(messages):
+                    started = time.perf_counter()
+                    await ws.send(frame)
+                    await ws.recv()
+                    latencies.append(time.perf_counter() - started)
+                    # Roughly what an interactive session looks like: a
+                    # message now and then over a connection that stays open.
+                    await asyncio.sleep(0.01)
+        except Exception:
+            errors += 1
+
+    with memory:
+        started = time.perf_counter()
+        await asyncio.gather(*(session() for _ in range(connections)))
+        seconds = time.perf_counter() - started
+    transferred = 2 * len(frame) * len(latencies)
+    return result("ws_echo", endpoint, latencies, errors, seconds, transferred, memory)
+
+
+SCENARIO_FUNCTIONS = {
+    "small_get": small_get,
+    "large_stream": large_stream,
+    "large_upload": large_upload,
+    "ws_echo": ws_echo,
+}
+
+
+async def wait_until_up(endpoint: Endpoint, process: subprocess.Popen, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with endpoint.http_client(1) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{endpoint.name} exited with code {process.returncode}")
+            try:
+                if (await client.get("/small")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{endpoint.name} did not come up within {timeout:.0f}s")
+
+
+def uvicorn_command(app: str, bind: List[str], app_dir: Path) -> List[str]:
+    return [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        app,
+        "--app-dir",
+        str(app_dir),
+        *bind,
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+
+
+@contextmanager
+def started(command: List[str], env: Dict[str, str] | None = None) -> Iterator[subprocess.Popen]:
+    process = subprocess.Popen(command, cwd=REPO_DIR, env={**os.environ, **(env or {})})
+    try:
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+@asynccontextmanager
+async def environment(transport: str) -> AsyncIterator[tuple[Endpoint, Endpoint, int]]:
+    """Start the stub and the proxy; yield (proxy, stub, proxy pid)."""
+    with tempfile.TemporaryDirectory(prefix="proxy-bench-") as tmp:
+        if transport == "unix":
+            stub_socket = os.path.join(tmp, "stub.sock")
+            stub_bind = ["--uds", stub_socket]
+            stub = Endpoint("direct", "http://localhost", "ws://localhost", stub_socket)
+            backend = f"unix://{stub_socket}"
+        else:
+            port = free_port()
+            stub_bind = ["--host", "127.0.0.1", "--port", str(port)]
+            stub = Endpoint("direct", f"http://127.0.0.1:{port}", f"ws://127.0.0.1:{port}")
+            backend = f"http://127.0.0.1:{port}"
+
+        proxy_port = free_port()
+        proxy = Endpoint("proxy", f"http://127.0.0.1:{proxy_port}", f"ws://127.0.0.1:{proxy_port}")
+        proxy_env = {**PROXY_ENV, "API_BACKEND": backend, "STREAMLIT_BACKEND": backend}
+
+        with started(uvicorn_command("stub_backend:app", stub_bind, BENCH_DIR)) as stub_process:
+            await wait_until_up(stub, stub_process)
+            proxy_bind = ["--host", "127.0.0.1", "--port", str(proxy_port)]
+            with started(uvicorn_command("proxy:app", proxy_bind, REPO_DIR), proxy_env) as proxy_process:
+                await wait_until_up(proxy, proxy_process)
+                yield proxy, stub, proxy_process.pid
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    results: List[ScenarioResult] = []
+    async with environment(args.transport) as (proxy, stub, proxy_pid):
+        for scenario in args.scenarios:
+            function = SCENARIO_FUNCTIONS[scenario]
+            targets = [(proxy, proxy_pid)] + ([(stub, None)] if args.baseline else [])
+            for endpoint, pid in targets:
+                outcome = await function(endpoint, args.scale, MemorySampler(pid))
+                results.append(outcome)
+                print(format_result(outcome), flush=True)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "transport": args.transport,
+        "scale": args.scale,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [asdict(outcome) for outcome in results],
+    }
+
+
+def format_result(outcome: ScenarioResult) -> str:
+    latency = outcome.latency_ms
+    memory = outcome.proxy_rss_mb
+    line = (
+        f"{outcome.scenario:<13} {outcome.target:<7} "
+        f"{outcome.ops_per_second:>9.1f} ops/s {outcome.mb_per_second:>8.1f} MB/s  "
+        f"p50 {latency.get('p50', 0):>8.2f}  p95 {latency.get('p95', 0):>8.2f}  "
+        f"p99 {latency.get('p99', 0):>8.2f} ms  errors {outcome.errors}"
+    )
+    if memory:
+        line += f"  rss peak {memory['peak']:.0f} MB"
+    return line
+
+
+def compare(before_path: str, after_path: str) -> None:
+    def load(path: str) -> Dict[tuple, Dict]:
+        with open(path) as handle:
+            data = json.load(handle)
+        return {(item["scenario"], item["target"]): item for item in data["results"]}
+
+    before, after = load(before_path), load(after_path)
+    print(f"{'scenario':<13} {'target':<7} {'metric':<14} {'before':>10} {'after':>10} {'change':>8}")
+    for key in sorted(before.keys() & after.keys(), key=lambda key: (SCENARIOS.index(key[0]), key[1])):
+        old, new = before[key], after[key]
+        rows = [
+            ("ops/s", old["ops_per_second"], new["ops_per_second"]),
+            ("MB/s", old["mb_per_second"], new["mb_per_second"]),
+            *(
+                (f"{name} ms", old["latency_ms"].get(name), new["latency_ms"].get(name))
+                for name in ("p50", "p95", "p99")
+            ),
+            ("rss peak MB", old["proxy_rss_mb"].get("peak"), new["proxy_rss_mb"].get("peak")),
+        ]
+        for metric, old_value, new_value in rows:
+            if old_value is None or new_value is None:
+                continue
+            change = f"{(new_value - old_value) / old_value * 100:+.1f}%" if old_value else "n/a"
+            print(f"{key[0]:<13} {key[1]:<7} {metric:<14} {old_value:>10} {new_value:>10} {change:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--transport", choices=("tcp", "unix"), default="tcp")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply request/message counts")
+    parser.add_argument("--baseline", action="store_true", help="also run against the stub directly")
+    parser.add_argument("--output", help="JSON results path (default bench/results/<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+
+    report = asyncio.run(run(args))
+    output = Path(args.output) if args.output else RESULTS_DIR / time.strftime("%Y%m%d-%H%M%S.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Stand-in for the API and Streamlit backends during benchmarks.
+
+Responses are generated in memory so the numbers measure the proxy, not
+the backend.
+"""
+
+from __future__ import annotations
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+CHUNK = b"x" * (64 * 1024)
+SMALL_BODY = b'{"status":"ok","items":[' + b",".join(b"%d" % i for i in range(40)) + b"]}"
+
+
+async def small(request: Request) -> Response:
+    return Response(SMALL_BODY, media_type="application/json")
+
+
+async def large(request: Request) -> Response:
+    size = int(request.query_params.get("bytes", str(16 * 1024 * 1024)))
+
+    async def body():
+        remaining = size
+        while remaining > 0:
+            chunk = CHUNK if remaining >= len(CHUNK) else CHUNK[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+
+    return StreamingResponse(
+        body(), media_type="application/octet-stream", headers={"Content-Length": str(size)}
+    )
+
+
+async def upload(request: Request) -> Response:
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+    return JSONResponse({"received": received})
+
+
+async def echo(websocket: WebSocket) -> None:
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text") is not None:
+                await websocket.send_text(message["text"])
+            else:
+                await websocket.send_bytes(message["bytes"])
+    except WebSocketDisconnect:
+        pass
+
+
+app = Starlette(
+    routes=[
+        Route("/small", small),
+        Route("/large", large),
+        Route("/upload", upload, methods=["POST"]),
+        WebSocketRoute("/_stcore/stream", echo),
+    ]
+)
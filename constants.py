@@ -8,4 +8,4 @@ HF_API_URL = 'https://api-inference.huggingface.co'
 
 HF_FEATURE_EXTRACTION_TASK = 'feature-extraction'
 
-MASADER_GH_REPO = 'ARBML/masader'
\ No newline at end of file
+MASADER_GH_REPO = 'ARBML/masader'
@@ -0,0 +1,211 @@
+"""Which credential a GitHub call is made with.
+
+Credentials are read from `.env` on every call, like the rest of the GitHub
+settings:
+
+- ``GITHUB_TOKEN`` and/or ``GITHUB_TOKENS`` (comma-separated): personal
+  access tokens.
+- ``GITHUB_APP_ID`` plus ``GITHUB_APP_PRIVATE_KEY`` (the PEM; ``\\n`` escapes
+  are fine) or ``GITHUB_APP_PRIVATE_KEY_FILE``, and optionally
+  ``GITHUB_APP_INSTALLATION_ID`` (otherwise looked up from the repository):
+  a GitHub App installation. Its tokens are minted with an RS256 app JWT and
+  reused until shortly before they expire.
+
+With several credentials configured each call takes the one with the most
+rate-limit budget left, round-robin among equals, so throughput adds up
+across them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import jwt
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from dotenv import load_dotenv
+
+from github_client import GithubClient
+
+_APP_DIR = Path(__file__).resolve().parent
+
+# Installation tokens live for an hour; mint a new one this long before the
+# old one expires.
+INSTALLATION_TOKEN_REFRESH_MARGIN = 300.0
+# GitHub rejects app JWTs valid for more than 10 minutes. The issued-at time
+# is backdated to allow for clock drift.
+APP_JWT_LIFETIME = 540
+APP_JWT_BACKDATE = 60
+
+
+class GithubAuthConfigError(Exception):
+    """The GitHub App settings in `.env` can't be used (unreadable key file,
+    malformed key)."""
+
+
+@dataclass(frozen=True)
+class AuthConfig:
+    tokens: Tuple[str, ...] = ()
+    app_id: str = ""
+    app_private_key: str = ""
+    app_installation_id: str = ""
+
+    @property
+    def has_app(self) -> bool:
+        return bool(self.app_id and self.app_private_key)
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.tokens) or self.has_app
+
+
+def load_auth_config() -> AuthConfig:
+    load_dotenv(_APP_DIR / ".env", override=True)
+    tokens = [(os.getenv("GITHUB_TOKEN") or "").strip()]
+    tokens += (os.getenv("GITHUB_TOKENS") or "").split(",")
+    private_key = (os.getenv("GITHUB_APP_PRIVATE_KEY") or "").strip().replace("\\n", "\n")
+    key_file = (os.getenv("GITHUB_APP_PRIVATE_KEY_FILE") or "").strip()
+    if not private_key and key_file:
+        try:
+            private_key = Path(key_file).expanduser().read_text()
+        except (OSError, UnicodeDecodeError) as exc:
+            raise GithubAuthConfigError(
+                f"Could not read GITHUB_APP_PRIVATE_KEY_FILE ({key_file}): {exc}"
+            ) from exc
+    return AuthConfig(
+        tokens=tuple(dict.fromkeys(token.strip() for token in tokens if token.strip())),
+        app_id=(os.getenv("GITHUB_APP_ID") or "").strip(),
+        app_private_key=private_key,
+        app_installation_id=(os.getenv("GITHUB_APP_INSTALLATION_ID") or "").strip(),
+    )
+
+
+class PersonalToken:
+    def __init__(self, token: str):
+        self.current = token
+
+    async def token(self, client: GithubClient, repo_name: str) -> str:
+        return self.current
+
+
+class AppInstallation:
+    def __init__(self, app_id: str, private_key: str, installation_id: str = ""):
+        self.app_id = app_id
+        self.private_key = parse_app_private_key(private_key)
+        self.installation_id = installation_id
+        self.current: str | None = None
+        self.expires_at = 0.0
+        self._minting: Dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+
+    def app_jwt(self) -> str:
+        now = int(time.time())
+        claims = {"iat": now - APP_JWT_BACKDATE, "exp": now + APP_JWT_LIFETIME, "iss": self.app_id}
+        return jwt.encode(claims, self.private_key, algorithm="RS256")
+
+    async def token(self, client: GithubClient, repo_name: str) -> str:
+        expires_in = self.expires_at - time.time()
+        if self.current is not None and expires_in > INSTALLATION_TOKEN_REFRESH_MARGIN:
+            return self.current
+        # Concurrent callers wait for the same mint.
+        loop = asyncio.get_running_loop()
+        minting = self._minting.get(loop)
+        if minting is None:
+            minting = self._minting[loop] = asyncio.ensure_future(self._mint(client, repo_name))
+            minting.add_done_callback(lambda _: self._minting.pop(loop, None))
+        return await asyncio.shield(minting)
+
+    async def _mint(self, client: GithubClient, repo_name: str) -> str:
+        app_jwt = self.app_jwt()
+        if not self.installation_id:
+            installation = await client.get_json(f"/repos/{repo_name}/installation", token=app_jwt)
+            self.installation_id = str(installation["id"])
+        response = await client.request(
+            "POST", f"/app/installations/{self.installation_id}/access_tokens", token=app_jwt
+        )
+        data = response.json()
+        self.current = data["token"]
+        expires_at = datetime.fromisoformat(data["expires_at"].replace("Z", "+00:00"))
+        self.expires_at = expires_at.timestamp()
+        return self.current
+
+
+def parse_app_private_key(pem: str) -> RSAPrivateKey:
+    """Parse the App key once, up front, so a bad key is reported as such
+    instead of failing every JWT."""
+    try:
+        key = load_pem_private_key(pem.encode(), password=None)
+    except (ValueError, TypeError, UnsupportedAlgorithm) as exc:
+        raise GithubAuthConfigError(
+            "The GitHub App private key is not a valid unencrypted PEM key."
+        ) from exc
+    if not isinstance(key, RSAPrivateKey):
+        raise GithubAuthConfigError("The GitHub App private key must be an RSA key.")
+    return key
+
+
+Credential = Union[PersonalToken, AppInstallation]
+
+
+def headroom(client: GithubClient, token: str | None) -> float:
+    """Smallest fraction of budget left across the REST and GraphQL limits
+    (1.0 when GitHub hasn't reported one yet)."""
+    if token is None:
+        return 1.0
+    now = time.time()
+    fractions = []
+    for resource in ("core", "graphql"):
+        budget = client.scheduler.budget(token, resource)
+        if budget is not None and budget.limit > 0 and budget.reset > now:
+            fractions.append(budget.remaining / budget.limit)
+    return min(fractions, default=1.0)
+
+
+class CredentialPool:
+    def __init__(self, credentials: List[Credential]):
+        self.credentials = credentials
+        self._next = 0
+
+    async def token(self, client: GithubClient, repo_name: str) -> str:
+        # Rotate the starting point so ties go round-robin; max() keeps the
+        # first of equal candidates.
+        start = self._next % len(self.credentials)
+        self._next += 1
+        candidates = self.credentials[start:] + self.credentials[:start]
+        best = max(candidates, key=lambda credential: headroom(client, credential.current))
+        return await best.token(client, repo_name)
+
+
+_pool: CredentialPool | None = None
+_pool_config: AuthConfig | None = None
+
+
+def credential_pool() -> CredentialPool | None:
+    """The pool for the current `.env`; rebuilt (dropping cached app tokens)
+    only when the configuration changes."""
+    global _pool, _pool_config
+    config = load_auth_config()
+    if config != _pool_config:
+        credentials: List[Credential] = [PersonalToken(token) for token in config.tokens]
+        if config.has_app:
+            credentials.append(
+                AppInstallation(config.app_id, config.app_private_key, config.app_installation_id)
+            )
+        _pool = CredentialPool(credentials) if credentials else None
+        _pool_config = config
+    return _pool
+
+
+async def github_token(client: GithubClient, repo_name: str) -> str | None:
+    """A token for the next call, or None when no credentials are configured.
+    Raises GithubAuthConfigError when the App settings are unusable."""
+    pool = credential_pool()
+    if pool is None:
+        return None
+    return await pool.token(client, repo_name)
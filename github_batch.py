@@ -0,0 +1,356 @@
+"""Push many dataset files at once, as separate PRs or as one PR.
+
+In single-PR mode everything lands on one ``batch-<hash>`` branch in a
+single commit built with the Git Data API (one tree, one commit, one ref
+update), and the read phase is one GraphQL query for all files.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Dict, List
+
+import httpx
+
+from constants import MASADER_GH_REPO
+from github_client import GithubApiError, GithubClient, get_client
+from github_push import (
+    GithubPushError,
+    PushResult,
+    canonical_metadata_json,
+    form_edit_url,
+    git_blob_sha,
+    github_credentials_ok,
+    github_error,
+    normalize_dataset_name,
+    push_metadata_idempotent_async,
+    push_token,
+    raw_github_json_url,
+    retry_conflicts,
+    unwrap_metadata,
+)
+from github_scheduler import background_priority
+
+PUSH_BATCH_CONCURRENCY = int(os.environ.get("PUSH_BATCH_CONCURRENCY", "4"))
+PUSH_BATCH_MAX_ITEMS = int(os.environ.get("PUSH_BATCH_MAX_ITEMS", "100"))
+
+
+@dataclass
+class BatchItem:
+    index: int
+    dataset_name: str
+    data_name: str
+    file_path: str
+    metadata: dict
+
+
+@dataclass
+class BatchItemResult:
+    index: int
+    name: str
+    result: PushResult | None = None
+    error: str | None = None
+    status_code: int = 200
+
+
+def prepare_batch(items: List[dict]) -> List[BatchItem]:
+    """Check every item before any GitHub work; raise one GithubPushError
+    listing all problems."""
+    if not items:
+        raise GithubPushError("items must contain at least one metadata object.")
+    if len(items) > PUSH_BATCH_MAX_ITEMS:
+        raise GithubPushError(f"A batch can hold at most {PUSH_BATCH_MAX_ITEMS} items.")
+
+    prepared: List[BatchItem] = []
+    problems: List[str] = []
+    seen: Dict[str, int] = {}
+    for index, item in enumerate(items):
+        metadata = unwrap_metadata(item) if isinstance(item, dict) else None
+        dataset_name = ((metadata or {}).get("Name") or "").strip()
+        if not dataset_name:
+            problems.append(f"item {index}: metadata must include a non-empty 'Name' field.")
+            continue
+        data_name = normalize_dataset_name(dataset_name)
+        if data_name in seen:
+            problems.append(f"item {index}: duplicates item {seen[data_name]} ({data_name}).")
+            continue
+        seen[data_name] = index
+        prepared.append(
+            BatchItem(
+                index=index,
+                dataset_name=dataset_name,
+                data_name=data_name,
+                file_path=f"datasets/{data_name}.json",
+                metadata=metadata,
+            )
+        )
+    if problems:
+        raise GithubPushError(" ".join(problems))
+    return prepared
+
+
+def batch_branch_name(items: List[BatchItem]) -> str:
+    # Stable for the same set of datasets, so a retried batch reuses its
+    # branch and PR.
+    digest = hashlib.sha1("\n".join(sorted(item.data_name for item in items)).encode())
+    return f"batch-{digest.hexdigest()[:10]}"
+
+
+def build_batch_pr_body(
+    github_username: str, items: List[BatchItem], *, repo_name: str, branch_name: str
+) -> str:
+    lines = [
+        f"This is a pull request by @{github_username} to add {len(items)} datasets "
+        "to the catalogue.\n",
+    ]
+    for item in items:
+        raw_url = raw_github_json_url(repo_name, branch_name, item.file_path)
+        line = f"- {item.dataset_name}: [`{item.file_path}`]({raw_url})"
+        edit_url = form_edit_url(raw_url)
+        if edit_url:
+            line += f' (<a href="{edit_url}" target="_blank" rel="noopener noreferrer">edit</a>)'
+        lines.append(line)
+    return "\n".join(lines)
+
+
+async def push_batch_separately(
+    items: List[BatchItem], github_username: str, *, repo_name: str, concurrency: int
+) -> List[BatchItemResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def push(item: BatchItem) -> BatchItemResult:
+        async with semaphore:
+            try:
+                result = await push_metadata_idempotent_async(
+                    item.metadata, github_username, repo_name=repo_name
+                )
+            except GithubPushError as exc:
+                return BatchItemResult(
+                    item.index, item.dataset_name, error=exc.message, status_code=exc.status_code
+                )
+        return BatchItemResult(item.index, item.dataset_name, result=result)
+
+    return list(await asyncio.gather(*(push(item) for item in items)))
+
+
+def batch_state_query(count: int) -> str:
+    variables = "".join(f", $b{i}: String!, $h{i}: String!" for i in range(count))
+    files = "".join(
+        f"    b{i}: object(expression: $b{i}) {{ ... on Blob {{ oid }} }}\n"
+        f"    h{i}: object(expression: $h{i}) {{ ... on Blob {{ oid }} }}\n"
+        for i in range(count)
+    )
+    return (
+        f"query($owner: String!, $name: String!, $branch: String!{variables}) {{\n"
+        "  repository(owner: $owner, name: $name) {\n"
+        "    defaultBranchRef { name target { oid ... on Commit { tree { oid } } } }\n"
+        "    branch: ref(qualifiedName: $branch) {\n"
+        "      target { oid ... on Commit { tree { oid } } }\n"
+        "      associatedPullRequests(states: OPEN, first: 1) { nodes { number url body } }\n"
+        "    }\n"
+        f"{files}"
+        "  }\n"
+        "}\n"
+    )
+
+
+async def push_batch_single_pr(
+    items: List[BatchItem], github_username: str, *, repo_name: str
+) -> List[BatchItemResult]:
+    git_user_name, git_user_email = github_credentials_ok()
+    author = {"name": git_user_name, "email": git_user_email}
+    client = get_client()
+    token = await push_token(client, repo_name)
+    branch_name = batch_branch_name(items)
+    owner, name = repo_name.split("/", 1)
+
+    variables = {"owner": owner, "name": name, "branch": f"refs/heads/{branch_name}"}
+    for i, item in enumerate(items):
+        variables[f"b{i}"] = f"{branch_name}:{item.file_path}"
+        variables[f"h{i}"] = f"HEAD:{item.file_path}"
+    try:
+        repository = (
+            await client.graphql(batch_state_query(len(items)), variables, token=token)
+        )["repository"]
+    except GithubApiError as exc:
+        raise GithubPushError(
+            f"GitHub API error ({exc.status}): {exc.message}", status_code=502
+        ) from exc
+
+    branch = repository["branch"]
+    base = branch if branch is not None else repository["defaultBranchRef"]
+    head_oid = base["target"]["oid"]
+    head_tree = base["target"]["tree"]["oid"]
+    prefix = "b" if branch is not None else "h"
+    pulls = branch["associatedPullRequests"]["nodes"] if branch is not None else []
+    open_pr = pulls[0] if pulls else None
+
+    changed: List[BatchItem] = []
+    contents: Dict[int, str] = {}
+    for i, item in enumerate(items):
+        content = canonical_metadata_json(item.metadata)
+        existing = repository[f"{prefix}{i}"]
+        if existing is None or existing["oid"] != git_blob_sha(content):
+            changed.append(item)
+            contents[item.index] = content
+
+    pr_url = open_pr["url"] if open_pr else None
+    if changed:
+        await commit_files(
+            client,
+            repo_name,
+            token,
+            branch_name=branch_name,
+            branch_exists=branch is not None,
+            head_oid=head_oid,
+            head_tree=head_tree,
+            files={item.file_path: contents[item.index] for item in changed},
+            author=author,
+        )
+        pr_body = build_batch_pr_body(
+            github_username, items, repo_name=repo_name, branch_name=branch_name
+        )
+        if open_pr is None:
+            try:
+                response = await client.request(
+                    "POST",
+                    f"/repos/{repo_name}/pulls",
+                    token=token,
+                    json={
+                        "title": f"Adding {len(items)} datasets to the catalogue",
+                        "body": pr_body,
+                        "head": branch_name,
+                        "base": repository["defaultBranchRef"]["name"],
+                    },
+                )
+            except GithubApiError as exc:
+                raise github_error("Could not create pull request", exc) from exc
+            pr_url = response.json()["html_url"]
+        elif open_pr["body"] != pr_body:
+            try:
+                await client.request(
+                    "PATCH",
+                    f"/repos/{repo_name}/pulls/{open_pr['number']}",
+                    token=token,
+                    json={"body": pr_body},
+                )
+            except GithubApiError as exc:
+                raise github_error("Could not update pull request", exc) from exc
+
+    status = "updated" if open_pr is not None else "created"
+    results = []
+    for item in items:
+        if item.index in contents:
+            result = PushResult(status=status, branch=branch_name, pull_request_url=pr_url)
+        else:
+            result = PushResult(
+                status="unchanged",
+                branch=branch_name,
+                pull_request_url=pr_url,
+                message="No changes made to the dataset.",
+            )
+        results.append(BatchItemResult(item.index, item.dataset_name, result=result))
+    return results
+
+
+async def commit_files(
+    client: GithubClient,
+    repo_name: str,
+    token: str,
+    *,
+    branch_name: str,
+    branch_exists: bool,
+    head_oid: str,
+    head_tree: str,
+    files: Dict[str, str],
+    author: dict,
+) -> str:
+    """Commit ``files`` on top of ``head_oid`` in one commit and move (or
+    create) the branch to it. Returns the new commit SHA."""
+    try:
+        tree = await client.request(
+            "POST",
+            f"/repos/{repo_name}/git/trees",
+            token=token,
+            json={
+                "base_tree": head_tree,
+                "tree": [
+                    {"path": path, "mode": "100644", "type": "blob", "content": content}
+                    for path, content in files.items()
+                ],
+            },
+        )
+        commit = await client.request(
+            "POST",
+            f"/repos/{repo_name}/git/commits",
+            token=token,
+            json={
+                "message": f"Updating {len(files)} dataset files",
+                "tree": tree.json()["sha"],
+                "parents": [head_oid],
+                "author": author,
+                "committer": author,
+            },
+        )
+        commit_sha = commit.json()["sha"]
+    except GithubApiError as exc:
+        raise github_error("Failed to commit the batch", exc) from exc
+
+    try:
+        if branch_exists:
+            # Not forced: if the branch moved since the read, this fails
+            # instead of dropping someone else's commit.
+            await client.request(
+                "PATCH",
+                f"/repos/{repo_name}/git/refs/heads/{branch_name}",
+                token=token,
+                json={"sha": commit_sha, "force": False},
+            )
+        else:
+            await client.request(
+                "POST",
+                f"/repos/{repo_name}/git/refs",
+                token=token,
+                json={"ref": f"refs/heads/{branch_name}", "sha": commit_sha},
+            )
+    except GithubApiError as exc:
+        raise github_error(f"Could not update branch `{branch_name}`", exc, write=True) from exc
+    return commit_sha
+
+
+async def push_metadata_batch_to_github_async(
+    items: List[dict],
+    github_username: str,
+    *,
+    single_pr: bool = False,
+    repo_name: str = MASADER_GH_REPO,
+    concurrency: int = PUSH_BATCH_CONCURRENCY,
+) -> List[BatchItemResult]:
+    """Push every item, either as its own ``add-<name>`` PR (with at most
+    ``concurrency`` in flight) or all together in one PR.
+
+    Failures of individual items are reported in their result; with
+    ``single_pr`` the batch succeeds or fails as a whole. Batch traffic runs
+    at background priority, behind interactive submits.
+    """
+    github_username = github_username.strip()
+    if not github_username:
+        raise GithubPushError("github_username is required.")
+    prepared = prepare_batch(items)
+    github_credentials_ok()
+
+    with background_priority():
+        if not single_pr:
+            return await push_batch_separately(
+                prepared, github_username, repo_name=repo_name, concurrency=concurrency
+            )
+        try:
+            return await retry_conflicts(
+                lambda: push_batch_single_pr(prepared, github_username, repo_name=repo_name),
+                what=batch_branch_name(prepared),
+            )
+        except httpx.TransportError as exc:
+            raise GithubPushError(f"Could not reach GitHub: {exc}", status_code=502) from exc
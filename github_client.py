@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Any, Awaitable, Dict, List, TypeVar
+
+import httpx
+
+from github_scheduler import ConditionalCache, RateLimitScheduler
+
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GITHUB_GRAPHQL_URL = os.environ.get("GITHUB_GRAPHQL_URL", f"{GITHUB_API_URL}/graphql")
+GITHUB_API_VERSION = "2022-11-28"
+
+# HTTP/2 multiplexes concurrent calls over one connection to api.github.com;
+# without the optional h2 package httpx falls back to HTTP/1.1 keep-alive.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+T = TypeVar("T")
+
+
+class GithubApiError(Exception):
+    def __init__(self, status: int, message: str, response: httpx.Response | None = None):
+        self.status = status
+        self.message = message
+        self.response = response
+        super().__init__(f"{status}: {message}")
+
+    @property
+    def headers(self) -> httpx.Headers:
+        return self.response.headers if self.response is not None else httpx.Headers()
+
+
+class GithubGraphQLError(GithubApiError):
+    """A GraphQL response that carried ``errors`` (GitHub answers those with
+    HTTP 200)."""
+
+    def __init__(self, errors: List[dict], response: httpx.Response | None = None):
+        self.errors = errors
+        message = "; ".join(str(error.get("message", error)) for error in errors)
+        super().__init__(response.status_code if response is not None else 200, message, response)
+
+    @property
+    def types(self) -> List[str]:
+        return [error.get("type", "") for error in self.errors]
+
+
+def error_message(response: httpx.Response) -> str:
+    try:
+        data = response.json()
+    except ValueError:
+        return response.text or response.reason_phrase
+    if isinstance(data, dict) and data.get("message"):
+        return str(data["message"])
+    return response.reason_phrase
+
+
+def rate_limit_resource(url: httpx.URL) -> str:
+    if str(url) == GITHUB_GRAPHQL_URL:
+        return "graphql"
+    if url.path.startswith("/search/"):
+        return "search"
+    return "core"
+
+
+class GithubClient:
+    """Async GitHub REST client on one pooled, keep-alive connection set.
+
+    The token is passed per call because credentials are re-read from `.env`
+    on every submit. Every call is paced by ``self.scheduler``, and GETs are
+    revalidated with ETags from ``self.etags``.
+    """
+
+    def __init__(self, base_url: str = GITHUB_API_URL, timeout: float = 10.0):
+        self.base_url = base_url
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            headers={
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": GITHUB_API_VERSION,
+            },
+        )
+        self.scheduler = RateLimitScheduler()
+        self.etags = ConditionalCache()
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        token: str | None = None,
+        params: Dict[str, Any] | None = None,
+        json: Any = None,
+    ) -> httpx.Response:
+        """Send a request and return the response, raising GithubApiError
+        for any 4xx/5xx status."""
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        request = self.http.build_request(method, path, params=params, json=json, headers=headers)
+        url = str(request.url)
+        cached = self.etags.get(token, url) if method == "GET" else None
+        if cached is not None:
+            request.headers["If-None-Match"] = cached.etag
+
+        resource = rate_limit_resource(request.url)
+        async with self.scheduler.slot(token, resource):
+            response = await self.http.send(request)
+        self.scheduler.observe(token, resource, response)
+
+        if response.status_code == 304 and cached is not None:
+            return cached.replay(request)
+        if method == "GET" and response.status_code == 200:
+            self.etags.put(token, url, response)
+        if response.status_code >= 400:
+            raise GithubApiError(response.status_code, error_message(response), response)
+        return response
+
+    async def get_json(self, path: str, **kwargs) -> Any:
+        return (await self.request("GET", path, **kwargs)).json()
+
+    async def graphql(
+        self, query: str, variables: Dict[str, Any] | None = None, *, token: str | None = None
+    ) -> Dict[str, Any]:
+        response = await self.request(
+            "POST", GITHUB_GRAPHQL_URL, token=token, json={"query": query, "variables": variables or {}}
+        )
+        payload = response.json()
+        if payload.get("errors"):
+            raise GithubGraphQLError(payload["errors"], response)
+        return payload["data"]
+
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, GithubClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_client() -> GithubClient:
+    """The shared client for the running event loop (httpx clients can't be
+    used across loops)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = GithubClient()
+    return client
+
+
+async def close_client() -> None:
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+_sync_loop: asyncio.AbstractEventLoop | None = None
+_sync_loop_lock = threading.Lock()
+
+
+def run_sync(awaitable: Awaitable[T]) -> T:
+    """Run a coroutine from synchronous code (the Streamlit script) on a
+    long-lived background loop, so its GitHub connections stay pooled across
+    calls instead of being torn down with a throwaway loop."""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_sync_loop.run_forever, name="github-client", daemon=True
+            ).start()
+    return asyncio.run_coroutine_threadsafe(awaitable, _sync_loop).result()
@@ -1,19 +1,74 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import contextvars
+import hashlib
 import json
+import logging
 import os
-from dataclasses import dataclass
+import random
+import weakref
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, Tuple, TypeVar
 from urllib.parse import urlencode
 
-import requests
+import httpx
 from dotenv import load_dotenv
-from github import Auth, Github, GithubException, InputGitAuthor
 
 from constants import MASADER_GH_REPO, VALID_PUNCT_NAMES
+from github_auth import GithubAuthConfigError, github_token, load_auth_config
+from github_client import GithubApiError, GithubClient, GithubGraphQLError, get_client, run_sync
+from sqlite_cache import SqliteTTLCache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# How the dataset file is committed: "rest" uses the Contents API,
+# "graphql" a single createCommitOnBranch mutation pinned to the branch head.
+WRITE_STRATEGIES = ("rest", "graphql")
+WRITE_STRATEGY = os.environ.get("GITHUB_WRITE_STRATEGY", "rest")
+if WRITE_STRATEGY not in WRITE_STRATEGIES:
+    raise ValueError(
+        f"GITHUB_WRITE_STRATEGY must be one of {WRITE_STRATEGIES}, got {WRITE_STRATEGY!r}"
+    )
+
+REMOTE_STATE_QUERY = """
+query($owner: String!, $name: String!, $branch: String!, $branchFile: String!, $baseFile: String!) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      name
+      target { oid }
+    }
+    branch: ref(qualifiedName: $branch) {
+      target { oid }
+      associatedPullRequests(states: OPEN, first: 1) {
+        nodes { number url body }
+      }
+    }
+    branchFile: object(expression: $branchFile) { ... on Blob { oid } }
+    baseFile: object(expression: $baseFile) { ... on Blob { oid } }
+  }
+}
+"""
+
+CREATE_COMMIT_MUTATION = """
+mutation($input: CreateCommitOnBranchInput!) {
+  createCommitOnBranch(input: $input) {
+    commit { oid }
+  }
+}
+"""
 
 _APP_DIR = Path(__file__).resolve().parent
 
+# Dataset files keep the key order of this card (top level and nested, e.g.
+# the Subsets entries); keys it doesn't have follow, sorted by name.
+DATASET_CARD_LAYOUT = json.loads((_APP_DIR / "shami.json").read_text(encoding="utf-8"))
+
 
 class GithubPushError(Exception):
     def __init__(self, message: str, status_code: int = 400):
@@ -22,6 +77,14 @@ class GithubPushError(Exception):
         super().__init__(message)
 
 
+class PushConflict(GithubPushError):
+    """A write lost a race with another push (branch created meanwhile, stale
+    file SHA or head OID); re-reading the state and trying again fixes it."""
+
+    def __init__(self, message: str):
+        super().__init__(message, status_code=409)
+
+
 @dataclass
 class PushResult:
     status: str
@@ -37,46 +100,119 @@ class GithubUserValidation:
     status_code: int = 400
 
 
-def validate_github_username(username: str) -> GithubUserValidation:
+GITHUB_USER_NOT_FOUND = "GitHub user not found. Please enter a valid GitHub username."
+GITHUB_CREDENTIALS_MISSING = (
+    "No GitHub credentials are set. Add GITHUB_TOKEN (or GitHub App settings) "
+    "to `.env` in the project root."
+)
+
+# Username lookups are cached in a SQLite file shared by the Streamlit app,
+# the API and the proxy. Existing users are cached for a day; unknown ones
+# (404) only briefly so a just-created account gets through soon. Other
+# failures are never cached.
+GITHUB_CACHE_DB = Path(os.environ.get("GITHUB_CACHE_DB", str(_APP_DIR / ".github_cache.sqlite3")))
+USER_CACHE_TTL = float(os.environ.get("GITHUB_USER_CACHE_TTL", "86400"))
+USER_NOT_FOUND_CACHE_TTL = float(os.environ.get("GITHUB_USER_NOT_FOUND_CACHE_TTL", "600"))
+BULK_VALIDATION_CONCURRENCY = 8
+
+_user_cache = SqliteTTLCache(GITHUB_CACHE_DB, "github_user")
+_user_lookups: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Task] = {}
+
+# Finished pushes are replayed for this long to retries with the same
+# Idempotency-Key. Without a key only an in-flight push is shared: replaying
+# by content would drop an edit that reverts to earlier content.
+PUSH_REPLAY_TTL = float(os.environ.get("GITHUB_PUSH_REPLAY_TTL", "600"))
+
+# Writes that lose a race with another push are retried this many times
+# from a fresh read. Within one process pushes of the same dataset are also
+# serialized, so those races only come from other processes.
+PUSH_CONFLICT_RETRIES = int(os.environ.get("GITHUB_PUSH_CONFLICT_RETRIES", "3"))
+
+# API-side debounce for rapid re-submits of one dataset: edits arriving
+# within this many seconds of each other become one commit of the latest
+# content (0 turns it off). A burst is flushed at the latest after
+# PUSH_COALESCE_MAX_WINDOWS windows so constant editing can't starve it.
+PUSH_COALESCE_SECONDS = float(os.environ.get("PUSH_COALESCE_SECONDS", "0"))
+PUSH_COALESCE_MAX_WINDOWS = 4
+
+_push_results = SqliteTTLCache(GITHUB_CACHE_DB, "push_result")
+_push_flights: Dict[Tuple[asyncio.AbstractEventLoop, str], Tuple[str, asyncio.Task]] = {}
+_progress: contextvars.ContextVar[Callable[..., None] | None] = contextvars.ContextVar(
+    "push_progress", default=None
+)
+_pending_pushes: Dict[Tuple[asyncio.AbstractEventLoop, str, str], "PendingPush"] = {}
+_dataset_locks: "weakref.WeakValueDictionary[Tuple[asyncio.AbstractEventLoop, str], asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+async def validate_github_username_async(username: str) -> GithubUserValidation:
     username = username.strip()
     if not username:
         return GithubUserValidation(ok=False, error="GitHub username is required.")
 
-    token, _, _ = load_github_credentials()
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
+    key = username.lower()
+    cached = _user_cache.get(key)
+    if cached is not None:
+        return GithubUserValidation(**cached)
+
+    # Concurrent checks of the same name share one request.
+    lookup_key = (asyncio.get_running_loop(), key)
+    lookup = _user_lookups.get(lookup_key)
+    if lookup is None:
+        lookup = asyncio.ensure_future(_lookup_github_user(username))
+        _user_lookups[lookup_key] = lookup
+        lookup.add_done_callback(lambda _: _user_lookups.pop(lookup_key, None))
+    validation = await asyncio.shield(lookup)
+
+    if validation.ok:
+        _user_cache.set(key, asdict(validation), USER_CACHE_TTL)
+    elif validation.status_code == 404:
+        _user_cache.set(key, asdict(validation), USER_NOT_FOUND_CACHE_TTL)
+    return validation
+
+
+async def validate_github_usernames_async(
+    usernames: Iterable[str], *, concurrency: int = BULK_VALIDATION_CONCURRENCY
+) -> Dict[str, GithubUserValidation]:
+    """Validate many usernames, at most ``concurrency`` lookups at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def validate(username: str) -> GithubUserValidation:
+        async with semaphore:
+            return await validate_github_username_async(username)
+
+    unique = list(dict.fromkeys(username.strip() for username in usernames))
+    results = await asyncio.gather(*(validate(username) for username in unique))
+    return dict(zip(unique, results))
+
 
+async def _lookup_github_user(username: str) -> GithubUserValidation:
+    client = get_client()
     try:
-        response = requests.get(
-            f"https://api.github.com/users/{username}",
-            headers=headers,
-            timeout=10,
-        )
-    except requests.RequestException as exc:
+        token = await github_token(client, MASADER_GH_REPO)
+        await client.request("GET", f"/users/{username}", token=token)
+    except httpx.TransportError as exc:
         return GithubUserValidation(
             ok=False,
             error=f"Could not reach GitHub to verify username: {exc}",
             status_code=502,
         )
+    except GithubApiError as exc:
+        return username_lookup_failure(exc)
+    except GithubAuthConfigError as exc:
+        return GithubUserValidation(ok=False, error=str(exc), status_code=500)
+    return GithubUserValidation(ok=True)
 
-    if response.status_code == 200:
-        return GithubUserValidation(ok=True)
 
-    if response.status_code == 404:
-        return GithubUserValidation(
-            ok=False,
-            error="GitHub user not found. Please enter a valid GitHub username.",
-            status_code=404,
-        )
+def username_lookup_failure(exc: GithubApiError) -> GithubUserValidation:
+    if exc.status == 404:
+        return GithubUserValidation(ok=False, error=GITHUB_USER_NOT_FOUND, status_code=404)
 
-    if response.status_code == 403:
-        remaining = response.headers.get("X-RateLimit-Remaining")
+    if exc.status == 403:
+        remaining = exc.headers.get("X-RateLimit-Remaining")
         if remaining == "0":
-            reset = response.headers.get("X-RateLimit-Reset", "unknown")
+            reset = exc.headers.get("X-RateLimit-Reset", "unknown")
             return GithubUserValidation(
                 ok=False,
                 error=(
@@ -93,11 +229,21 @@ def validate_github_username(username: str) -> GithubUserValidation:
 
     return GithubUserValidation(
         ok=False,
-        error=f"Could not verify GitHub username (HTTP {response.status_code}).",
+        error=f"Could not verify GitHub username (HTTP {exc.status}).",
         status_code=502,
     )
 
 
+def validate_github_username(username: str) -> GithubUserValidation:
+    return run_sync(validate_github_username_async(username))
+
+
+def validate_github_usernames(
+    usernames: Iterable[str], *, concurrency: int = BULK_VALIDATION_CONCURRENCY
+) -> Dict[str, GithubUserValidation]:
+    return run_sync(validate_github_usernames_async(usernames, concurrency=concurrency))
+
+
 def load_github_credentials() -> tuple[str, str, str]:
     load_dotenv(_APP_DIR / ".env", override=True)
     return (
@@ -107,19 +253,38 @@ def load_github_credentials() -> tuple[str, str, str]:
     )
 
 
-def github_credentials_ok() -> tuple[str, str, str]:
-    token, user_name, user_email = load_github_credentials()
-    if not token:
-        raise GithubPushError(
-            "GITHUB_TOKEN is not set. Add it to `.env` in the project root.",
-            status_code=500,
-        )
+def github_credentials_ok() -> tuple[str, str]:
+    """Check the GitHub settings in `.env` and return the commit author."""
+    _, user_name, user_email = load_github_credentials()
+    try:
+        configured = load_auth_config().configured
+    except GithubAuthConfigError as exc:
+        raise GithubPushError(str(exc), status_code=500) from exc
+    if not configured:
+        raise GithubPushError(GITHUB_CREDENTIALS_MISSING, status_code=500)
     if not user_name or not user_email:
         raise GithubPushError(
             "GIT_USER_NAME and GIT_USER_EMAIL must be set in `.env`.",
             status_code=500,
         )
-    return token, user_name, user_email
+    return user_name, user_email
+
+
+async def push_token(client: GithubClient, repo_name: str) -> str:
+    """A token from the credential pool, minting a GitHub App installation
+    token if needed."""
+    try:
+        token = await github_token(client, repo_name)
+    except GithubApiError as exc:
+        raise GithubPushError(
+            f"Could not get a GitHub App installation token ({exc.status}): {exc.message}",
+            status_code=502,
+        ) from exc
+    except GithubAuthConfigError as exc:
+        raise GithubPushError(str(exc), status_code=500) from exc
+    if token is None:
+        raise GithubPushError(GITHUB_CREDENTIALS_MISSING, status_code=500)
+    return token
 
 
 def normalize_dataset_name(name: str) -> str:
@@ -137,6 +302,36 @@ def unwrap_metadata(payload: dict) -> dict:
     return payload
 
 
+def canonical_value(value: Any, layout: Any) -> Any:
+    """``value`` with every object's keys in the order ``layout`` (the
+    matching part of the reference card) has them, then any others sorted.
+    List items follow the layout of the card's first item."""
+    if isinstance(value, dict):
+        order = [key for key in layout if key in value] if isinstance(layout, dict) else []
+        order += sorted(key for key in value if key not in order)
+        return {
+            key: canonical_value(value[key], layout.get(key) if isinstance(layout, dict) else None)
+            for key in order
+        }
+    if isinstance(value, list):
+        item_layout = layout[0] if isinstance(layout, list) and layout else None
+        return [canonical_value(item, item_layout) for item in value]
+    return value
+
+
+def canonical_metadata_json(metadata: dict) -> str:
+    """The dataset file contents, laid out like the reference card so the
+    same metadata always serializes to the same bytes."""
+    return json.dumps(canonical_value(metadata, DATASET_CARD_LAYOUT), indent=4)
+
+
+def git_blob_sha(content: str) -> str:
+    """The object id git (and GitHub) gives a file with this content, so an
+    unchanged file is spotted from its OID without downloading it."""
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
 def raw_github_json_url(repo_name: str, branch_name: str, file_path: str) -> str:
     return f"https://raw.githubusercontent.com/{repo_name}/{branch_name}/{file_path}"
 
@@ -173,35 +368,157 @@ def build_pr_body(
     return body
 
 
-def remote_branch_exists(repo, branch_name: str) -> bool:
-    try:
-        repo.get_git_ref(f"heads/{branch_name}")
-        return True
-    except GithubException:
-        return False
+def is_conflict(exc: GithubApiError) -> bool:
+    if isinstance(exc, GithubGraphQLError):
+        return "STALE_DATA" in exc.types
+    return exc.status in (409, 422)
 
 
-def find_open_pr_for_branch(gh_repo, branch_name: str):
-    owner = gh_repo.owner.login
-    for pr in gh_repo.get_pulls(head=f"{owner}:{branch_name}", state="open"):
-        return pr
-    return None
+def github_error(prefix: str, exc: GithubApiError, *, write: bool = False) -> GithubPushError:
+    """Only a ref or file ``write`` can lose a race with a concurrent push;
+    a 409/422 from anything else (say, opening the PR) is a real error and
+    must not be retried away."""
+    if write and is_conflict(exc):
+        return PushConflict(f"{prefix}: {exc.message}")
+    return GithubPushError(f"{prefix}: {exc.message}", status_code=502)
 
 
-def push_metadata_to_github(
+async def commit_via_rest(
+    client: GithubClient,
+    repo_name: str,
+    token: str,
+    *,
+    branch_name: str,
+    file_path: str,
+    content: str,
+    message: str,
+    author: dict,
+    existing_sha: str | None,
+    head_oid: str,
+) -> None:
+    payload = {
+        "message": message,
+        "content": base64.b64encode(content.encode("utf-8")).decode("ascii"),
+        "branch": branch_name,
+        "author": author,
+        "committer": author,
+    }
+    if existing_sha is not None:
+        payload["sha"] = existing_sha
+    await client.request("PUT", f"/repos/{repo_name}/contents/{file_path}", token=token, json=payload)
+
+
+async def commit_via_graphql(
+    client: GithubClient,
+    repo_name: str,
+    token: str,
+    *,
+    branch_name: str,
+    file_path: str,
+    content: str,
+    message: str,
+    author: dict,
+    existing_sha: str | None,
+    head_oid: str,
+) -> None:
+    # createCommitOnBranch signs the commit as the token's owner and can't
+    # take a separate author; expectedHeadOid makes it fail instead of
+    # overwriting a concurrent commit.
+    await client.graphql(
+        CREATE_COMMIT_MUTATION,
+        {
+            "input": {
+                "branch": {"repositoryNameWithOwner": repo_name, "branchName": branch_name},
+                "message": {"headline": message},
+                "expectedHeadOid": head_oid,
+                "fileChanges": {
+                    "additions": [
+                        {
+                            "path": file_path,
+                            "contents": base64.b64encode(content.encode("utf-8")).decode("ascii"),
+                        }
+                    ]
+                },
+            }
+        },
+        token=token,
+    )
+
+
+COMMIT_STRATEGIES = {"rest": commit_via_rest, "graphql": commit_via_graphql}
+
+
+@dataclass
+class RemoteFile:
+    oid: str
+
+
+@dataclass
+class RemoteState:
+    default_branch: str
+    default_head: str
+    # None when the add-<name> branch doesn't exist yet.
+    branch_head: str | None
+    # The dataset file on the branch, or on the default branch when the
+    # branch doesn't exist yet (that's what a new branch will start from).
+    file: RemoteFile | None
+    open_pr: dict | None
+
+
+async def fetch_remote_state(
+    client: GithubClient, repo_name: str, branch_name: str, file_path: str, token: str
+) -> RemoteState:
+    """Everything the write phase needs, in one GraphQL round-trip."""
+    owner, name = repo_name.split("/", 1)
+    data = await client.graphql(
+        REMOTE_STATE_QUERY,
+        {
+            "owner": owner,
+            "name": name,
+            "branch": f"refs/heads/{branch_name}",
+            "branchFile": f"{branch_name}:{file_path}",
+            "baseFile": f"HEAD:{file_path}",
+        },
+        token=token,
+    )
+    repository = data["repository"]
+    branch = repository["branch"]
+    blob = repository["branchFile"] if branch is not None else repository["baseFile"]
+    pulls = branch["associatedPullRequests"]["nodes"] if branch is not None else []
+    open_pr = None
+    if pulls:
+        pr = pulls[0]
+        open_pr = {"number": pr["number"], "html_url": pr["url"], "body": pr["body"]}
+    return RemoteState(
+        default_branch=repository["defaultBranchRef"]["name"],
+        default_head=repository["defaultBranchRef"]["target"]["oid"],
+        branch_head=branch["target"]["oid"] if branch is not None else None,
+        file=RemoteFile(oid=blob["oid"]) if blob else None,
+        open_pr=open_pr,
+    )
+
+
+async def push_metadata_to_github_async(
     metadata: dict,
     github_username: str,
     *,
     repo_name: str = MASADER_GH_REPO,
 ) -> PushResult:
-    """Create/update the dataset JSON and open (or refresh) a PR entirely via the
-    GitHub REST API.
+    """Create/update the dataset JSON and open (or refresh) a PR through the
+    GitHub API, without a local clone.
+
+    One GraphQL query reads the branch, the file's blob SHA on it (or on the
+    default branch) and any open PR; an unchanged file stops there. The file is
+    then committed with the Contents API or, with
+    ``GITHUB_WRITE_STRATEGY=graphql``, a ``createCommitOnBranch`` mutation
+    pinned to the head that was read, and the PR is opened or updated over
+    REST.
 
     This intentionally avoids cloning the (large) ``ARBML/masader`` repository:
     cloning inside a resource-constrained container is slow and blocks the
     request long enough to trip the platform's proxy timeout ("upstream error")
-    and trigger a restart. The Git Data / Contents API touches only the single
-    file we care about, so a submit stays fast and cheap.
+    and trigger a restart. The API touches only the single file we care about,
+    so a submit stays fast and cheap.
     """
     metadata = unwrap_metadata(metadata)
     dataset_name = (metadata.get("Name") or "").strip()
@@ -212,7 +529,7 @@ def push_metadata_to_github(
     if not github_username:
         raise GithubPushError("github_username is required.")
 
-    github_token, git_user_name, git_user_email = github_credentials_ok()
+    git_user_name, git_user_email = github_credentials_ok()
     data_name = normalize_dataset_name(dataset_name)
     branch_name = f"add-{data_name}"
     file_path = f"datasets/{data_name}.json"
@@ -225,120 +542,345 @@ def push_metadata_to_github(
         file_path=file_path,
     )
 
+    async def push() -> PushResult:
+        client = get_client()
+        return await _push(
+            client,
+            repo_name,
+            await push_token(client, repo_name),
+            metadata,
+            author={"name": git_user_name, "email": git_user_email},
+            branch_name=branch_name,
+            file_path=file_path,
+            pr_title=pr_title,
+            pr_body=pr_body,
+        )
+
     try:
-        g = Github(auth=Auth.Token(github_token))
-        repo = g.get_repo(repo_name)
-        default_branch = repo.default_branch
-    except GithubException as exc:
+        async with dataset_lock(data_name):
+            return await retry_conflicts(push, what=branch_name)
+    except httpx.TransportError as exc:
+        raise GithubPushError(f"Could not reach GitHub: {exc}", status_code=502) from exc
+
+
+def dataset_lock(data_name: str) -> asyncio.Lock:
+    key = (asyncio.get_running_loop(), data_name)
+    lock = _dataset_locks.get(key)
+    if lock is None:
+        lock = _dataset_locks[key] = asyncio.Lock()
+    return lock
+
+
+async def retry_conflicts(
+    push: Callable[[], Awaitable[T]], *, what: str, retries: int = PUSH_CONFLICT_RETRIES
+) -> T:
+    """Run ``push`` (which reads the remote state itself) again whenever a
+    write conflicts with a concurrent push."""
+    attempt = 0
+    while True:
+        try:
+            return await push()
+        except PushConflict as exc:
+            if attempt >= retries:
+                raise
+            delay = 0.1 * 2**attempt * random.uniform(0.5, 1.5)
+            attempt += 1
+            logger.info("Push to %s conflicted (%s); retrying in %.2fs", what, exc.message, delay)
+            await asyncio.sleep(delay)
+
+
+@contextmanager
+def push_progress(callback: Callable[..., None]) -> Iterator[None]:
+    """Call ``callback(stage, **details)`` as pushes started inside the block
+    (including tasks they spawn) pass each stage: ``state_read``,
+    ``branch_ready``, ``committed`` and ``pr_opened``. A push shared with an
+    earlier identical or coalesced call reports to that call instead."""
+    token = _progress.set(callback)
+    try:
+        yield
+    finally:
+        _progress.reset(token)
+
+
+def report_progress(stage: str, **details: Any) -> None:
+    callback = _progress.get()
+    if callback is not None:
+        callback(stage, **details)
+
+
+async def _push(
+    client: GithubClient,
+    repo_name: str,
+    token: str,
+    metadata: dict,
+    *,
+    author: dict,
+    branch_name: str,
+    file_path: str,
+    pr_title: str,
+    pr_body: str,
+) -> PushResult:
+    try:
+        state = await fetch_remote_state(client, repo_name, branch_name, file_path, token)
+    except GithubApiError as exc:
         if exc.status == 401:
             raise GithubPushError(
-                "GitHub authentication failed (401). Check GITHUB_TOKEN in `.env`.",
+                "GitHub authentication failed (401). Check the GitHub credentials in `.env`.",
                 status_code=401,
             ) from exc
-        message = exc.data.get("message", str(exc)) if exc.data else str(exc)
         raise GithubPushError(
-            f"GitHub API error ({exc.status}): {message}",
+            f"GitHub API error ({exc.status}): {exc.message}",
             status_code=502,
         ) from exc
-
-    branch_exists_on_remote = remote_branch_exists(repo, branch_name)
-    open_pr = (
-        find_open_pr_for_branch(repo, branch_name) if branch_exists_on_remote else None
-    )
+    report_progress("state_read")
+    open_pr = state.open_pr
+    head_oid = state.branch_head
 
     # Create the working branch off the default branch head when it doesn't exist.
-    if not branch_exists_on_remote:
+    if head_oid is None:
+        head_oid = state.default_head
         try:
-            base_sha = repo.get_branch(default_branch).commit.sha
-            repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=base_sha)
-        except GithubException as exc:
-            message = exc.data.get("message", str(exc)) if exc.data else str(exc)
-            raise GithubPushError(
-                f"Could not create branch `{branch_name}`: {message}",
-                status_code=502,
+            await client.request(
+                "POST",
+                f"/repos/{repo_name}/git/refs",
+                token=token,
+                json={"ref": f"refs/heads/{branch_name}", "sha": head_oid},
+            )
+        except GithubApiError as exc:
+            raise github_error(
+                f"Could not create branch `{branch_name}`", exc, write=True
             ) from exc
+    report_progress("branch_ready", branch=branch_name, created=state.branch_head is None)
 
-    new_content = json.dumps(metadata, indent=4)
-
-    # Look up the existing file on the branch (if any) to decide create vs update
-    # and to short-circuit when nothing changed.
-    existing_file = None
-    try:
-        existing_file = repo.get_contents(file_path, ref=branch_name)
-    except GithubException as exc:
-        if exc.status != 404:
-            message = exc.data.get("message", str(exc)) if exc.data else str(exc)
-            raise GithubPushError(
-                f"Could not read `{file_path}`: {message}",
-                status_code=502,
-            ) from exc
+    new_content = canonical_metadata_json(metadata)
+    existing_file = state.file
 
-    if existing_file is not None:
-        current_content = existing_file.decoded_content.decode("utf-8")
-        if current_content == new_content:
-            return PushResult(
-                status="unchanged",
-                branch=branch_name,
-                pull_request_url=open_pr.html_url if open_pr else None,
-                message="No changes made to the dataset.",
-            )
+    if existing_file is not None and existing_file.oid == git_blob_sha(new_content):
+        return PushResult(
+            status="unchanged",
+            branch=branch_name,
+            pull_request_url=open_pr["html_url"] if open_pr else None,
+            message="No changes made to the dataset.",
+        )
 
-    author = InputGitAuthor(git_user_name, git_user_email)
     commit_message = (
         f"Updating {file_path}" if existing_file is not None else f"Creating {file_path}"
     )
-
     try:
-        if existing_file is not None:
-            repo.update_file(
-                file_path,
-                commit_message,
-                new_content,
-                existing_file.sha,
-                branch=branch_name,
-                author=author,
-                committer=author,
-            )
-        else:
-            repo.create_file(
-                file_path,
-                commit_message,
-                new_content,
-                branch=branch_name,
-                author=author,
-                committer=author,
-            )
-    except GithubException as exc:
-        message = exc.data.get("message", str(exc)) if exc.data else str(exc)
-        raise GithubPushError(
-            f"Failed to commit `{file_path}`: {message}",
-            status_code=502,
-        ) from exc
+        await COMMIT_STRATEGIES[WRITE_STRATEGY](
+            client,
+            repo_name,
+            token,
+            branch_name=branch_name,
+            file_path=file_path,
+            content=new_content,
+            message=commit_message,
+            author=author,
+            existing_sha=existing_file.oid if existing_file is not None else None,
+            head_oid=head_oid,
+        )
+    except GithubApiError as exc:
+        raise github_error(f"Failed to commit `{file_path}`", exc, write=True) from exc
+    report_progress("committed", file=file_path)
+
+    if open_pr and open_pr.get("body") == pr_body:
+        # Nothing to refresh on the PR.
+        report_progress("pr_opened", pull_request_url=open_pr["html_url"], action="unchanged")
+        return PushResult(
+            status="updated",
+            branch=branch_name,
+            pull_request_url=open_pr["html_url"],
+        )
 
     if open_pr:
-        open_pr.edit(body=pr_body)
+        try:
+            await client.request(
+                "PATCH",
+                f"/repos/{repo_name}/pulls/{open_pr['number']}",
+                token=token,
+                json={"body": pr_body},
+            )
+        except GithubApiError as exc:
+            raise github_error("Could not update pull request", exc) from exc
+        report_progress("pr_opened", pull_request_url=open_pr["html_url"], action="updated")
         return PushResult(
             status="updated",
             branch=branch_name,
-            pull_request_url=open_pr.html_url,
+            pull_request_url=open_pr["html_url"],
         )
 
     try:
-        pr = repo.create_pull(
-            title=pr_title,
-            body=pr_body,
-            head=branch_name,
-            base=default_branch,
+        response = await client.request(
+            "POST",
+            f"/repos/{repo_name}/pulls",
+            token=token,
+            json={
+                "title": pr_title,
+                "body": pr_body,
+                "head": branch_name,
+                "base": state.default_branch,
+            },
         )
-    except GithubException as exc:
-        message = exc.data.get("message", str(exc)) if exc.data else str(exc)
-        raise GithubPushError(
-            f"Could not create pull request: {message}",
-            status_code=502,
-        ) from exc
+        pr = response.json()
+    except GithubApiError as exc:
+        raise github_error("Could not create pull request", exc) from exc
+    report_progress("pr_opened", pull_request_url=pr["html_url"], action="created")
 
     return PushResult(
         status="created",
         branch=branch_name,
-        pull_request_url=pr.html_url,
+        pull_request_url=pr["html_url"],
+    )
+
+
+def push_fingerprint(metadata: dict, github_username: str, repo_name: str) -> str:
+    payload = json.dumps(
+        [repo_name, github_username.strip().lower(), unwrap_metadata(metadata)], sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def derived_idempotency_key(metadata: dict, fingerprint: str) -> str:
+    data_name = normalize_dataset_name((unwrap_metadata(metadata).get("Name") or "").strip())
+    return f"{data_name}:{fingerprint[:16]}"
+
+
+async def push_metadata_idempotent_async(
+    metadata: dict,
+    github_username: str,
+    *,
+    idempotency_key: str | None = None,
+    coalesce_seconds: float = 0.0,
+    repo_name: str = MASADER_GH_REPO,
+) -> PushResult:
+    """``push_metadata_to_github_async`` for callers that may repeat themselves.
+
+    Identical concurrent calls share one push. With an explicit
+    ``idempotency_key`` a successful result is also replayed for
+    ``PUSH_REPLAY_TTL`` seconds, and reusing the key for a different request
+    is a 422. Without one the dataset name and a hash of the content and user
+    only identify the in-flight push; a later call pushes again. With
+    ``coalesce_seconds`` different edits of one dataset are debounced too
+    (see ``push_metadata_coalesced_async``).
+    """
+    fingerprint = push_fingerprint(metadata, github_username, repo_name)
+    if idempotency_key:
+        key = f"key:{idempotency_key}"
+    else:
+        key = f"auto:{derived_idempotency_key(metadata, fingerprint)}"
+    mismatch = GithubPushError(
+        "Idempotency-Key was already used for a different request.", status_code=422
+    )
+
+    cached = _push_results.get(key) if idempotency_key else None
+    if cached is not None:
+        if cached["fingerprint"] != fingerprint:
+            raise mismatch
+        return PushResult(**cached["result"])
+
+    flight_key = (asyncio.get_running_loop(), key)
+    flight = _push_flights.get(flight_key)
+    if flight is None:
+        task = asyncio.ensure_future(
+            push_metadata_coalesced_async(
+                metadata, github_username, window=coalesce_seconds, repo_name=repo_name
+            )
+        )
+        flight = _push_flights[flight_key] = (fingerprint, task)
+
+        def finished(task: asyncio.Task) -> None:
+            _push_flights.pop(flight_key, None)
+            if idempotency_key and not task.cancelled() and task.exception() is None:
+                _push_results.set(
+                    key,
+                    {"fingerprint": fingerprint, "result": asdict(task.result())},
+                    PUSH_REPLAY_TTL,
+                )
+
+        task.add_done_callback(finished)
+    if flight[0] != fingerprint:
+        raise mismatch
+    # Shielded so one caller going away doesn't cancel the push for the rest.
+    return await asyncio.shield(flight[1])
+
+
+@dataclass
+class PendingPush:
+    metadata: dict
+    github_username: str
+    result: asyncio.Future
+    # Loop times: when the burst flushes if no further edit arrives, and the
+    # latest it may flush at all.
+    due: float
+    deadline: float
+    edits: int = 1
+
+
+async def push_metadata_coalesced_async(
+    metadata: dict,
+    github_username: str,
+    *,
+    window: float,
+    repo_name: str = MASADER_GH_REPO,
+) -> PushResult:
+    """Wait until no new edit of this dataset has arrived for ``window``
+    seconds, then push the latest content once; every caller in the burst
+    gets that push's result."""
+    metadata = unwrap_metadata(metadata)
+    dataset_name = (metadata.get("Name") or "").strip()
+    if window <= 0 or not dataset_name:
+        return await push_metadata_to_github_async(metadata, github_username, repo_name=repo_name)
+
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    key = (loop, repo_name, normalize_dataset_name(dataset_name))
+    pending = _pending_pushes.get(key)
+    if pending is None:
+        pending = _pending_pushes[key] = PendingPush(
+            metadata=metadata,
+            github_username=github_username,
+            result=loop.create_future(),
+            due=now + window,
+            deadline=now + window * PUSH_COALESCE_MAX_WINDOWS,
+        )
+        asyncio.ensure_future(_flush_when_due(key, pending, repo_name))
+    else:
+        pending.metadata = metadata
+        pending.github_username = github_username
+        pending.due = min(now + window, pending.deadline)
+        pending.edits += 1
+    return await asyncio.shield(pending.result)
+
+
+async def _flush_when_due(
+    key: Tuple[asyncio.AbstractEventLoop, str, str], pending: PendingPush, repo_name: str
+) -> None:
+    loop = key[0]
+    try:
+        while pending.due > loop.time():
+            await asyncio.sleep(pending.due - loop.time())
+        _pending_pushes.pop(key, None)
+        if pending.edits > 1:
+            logger.info("Coalesced %d edits of %s into one push", pending.edits, key[2])
+        result = await push_metadata_to_github_async(
+            pending.metadata, pending.github_username, repo_name=repo_name
+        )
+    except BaseException as exc:
+        _pending_pushes.pop(key, None)
+        if isinstance(exc, asyncio.CancelledError):
+            pending.result.cancel()
+            raise
+        pending.result.set_exception(exc)
+    else:
+        pending.result.set_result(result)
+
+
+def push_metadata_to_github(
+    metadata: dict,
+    github_username: str,
+    *,
+    repo_name: str = MASADER_GH_REPO,
+) -> PushResult:
+    return run_sync(
+        push_metadata_idempotent_async(metadata, github_username, repo_name=repo_name)
     )
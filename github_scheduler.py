@@ -0,0 +1,211 @@
+"""Central pacing for GitHub traffic.
+
+Every call made through ``GithubClient`` takes a slot here first. The
+scheduler tracks the ``X-RateLimit-*`` budget GitHub reports for each token
+and resource, spreads requests out as that budget runs low, honours
+``Retry-After`` pauses, and hands free slots to interactive callers before
+background work (batch pushes, queued jobs).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterator, List, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+GITHUB_MAX_CONCURRENCY = int(os.environ.get("GITHUB_MAX_CONCURRENCY", "8"))
+# Below this fraction of the hourly budget requests are spread evenly over
+# the time left until the reset.
+GITHUB_RATE_LIMIT_SLOWDOWN = float(os.environ.get("GITHUB_RATE_LIMIT_SLOWDOWN", "0.2"))
+# Background work stops at this fraction, keeping the rest for interactive
+# submits.
+GITHUB_RATE_LIMIT_RESERVE = float(os.environ.get("GITHUB_RATE_LIMIT_RESERVE", "0.05"))
+# Interactive calls never wait longer than this; past it they go out and let
+# GitHub answer.
+GITHUB_INTERACTIVE_MAX_WAIT = float(os.environ.get("GITHUB_INTERACTIVE_MAX_WAIT", "10"))
+if not 0 <= GITHUB_RATE_LIMIT_RESERVE <= GITHUB_RATE_LIMIT_SLOWDOWN <= 1:
+    raise ValueError(
+        "need 0 <= GITHUB_RATE_LIMIT_RESERVE <= GITHUB_RATE_LIMIT_SLOWDOWN <= 1, got "
+        f"{GITHUB_RATE_LIMIT_RESERVE} and {GITHUB_RATE_LIMIT_SLOWDOWN}"
+    )
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "github_priority", default=INTERACTIVE
+)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Run GitHub calls made inside the block (and tasks started from it)
+    behind interactive ones."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def token_key(token: str | None) -> str:
+    if not token:
+        return "anonymous"
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+@dataclass
+class RateLimit:
+    limit: int
+    remaining: int
+    reset: float
+
+
+class RateLimitScheduler:
+    def __init__(self, max_concurrency: int = GITHUB_MAX_CONCURRENCY):
+        self._available = max_concurrency
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._budgets: Dict[Tuple[str, str], RateLimit] = {}
+        # When the next paced call for each (token, resource) may go out.
+        self._next_send: Dict[Tuple[str, str], float] = {}
+        self._paused_until = 0.0
+
+    def budget(self, token: str | None, resource: str) -> RateLimit | None:
+        return self._budgets.get((token_key(token), resource))
+
+    def delay(self, token: str | None, resource: str, priority: int) -> float:
+        """Seconds to wait before sending. While the budget is low this
+        reserves the caller's send time, so concurrent callers are spaced
+        out one after another instead of all waiting the same interval."""
+        now = time.time()
+        delay = max(self._paused_until - now, 0.0)
+        budget = self.budget(token, resource)
+        if budget is not None and budget.reset > now and budget.limit > 0:
+            until_reset = budget.reset - now
+            if budget.remaining <= 0:
+                delay = max(delay, until_reset)
+            elif priority == BACKGROUND and budget.remaining <= budget.limit * GITHUB_RATE_LIMIT_RESERVE:
+                delay = max(delay, until_reset)
+            elif budget.remaining <= budget.limit * GITHUB_RATE_LIMIT_SLOWDOWN:
+                # No await between reading and moving the reservation, so it
+                # is atomic on the event loop.
+                key = (token_key(token), resource)
+                send_at = max(now + delay, self._next_send.get(key, 0.0))
+                self._next_send[key] = send_at + until_reset / budget.remaining
+                delay = send_at - now
+        if priority == INTERACTIVE:
+            delay = min(delay, GITHUB_INTERACTIVE_MAX_WAIT)
+        return delay
+
+    @asynccontextmanager
+    async def slot(self, token: str | None, resource: str) -> AsyncIterator[None]:
+        priority = _priority.get()
+        delay = self.delay(token, resource, priority)
+        if delay > 0:
+            if delay >= 1:
+                logger.info("GitHub %s budget low; waiting %.1fs", resource, delay)
+            await asyncio.sleep(delay)
+        await self._acquire(priority)
+        budget = self.budget(token, resource)
+        if budget is not None:
+            # Count the call now so concurrent callers see it before
+            # GitHub's next headers arrive.
+            budget.remaining -= 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int) -> None:
+        if self._available > 0 and not self._waiters:
+            self._available -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled.
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._available += 1
+
+    def observe(self, token: str | None, resource: str, response: httpx.Response) -> None:
+        headers = response.headers
+        remaining = headers.get("X-RateLimit-Remaining", "")
+        limit = headers.get("X-RateLimit-Limit", "")
+        reset = headers.get("X-RateLimit-Reset", "")
+        if remaining.isdigit() and limit.isdigit() and reset.isdigit():
+            resource = headers.get("X-RateLimit-Resource", resource)
+            self._budgets[(token_key(token), resource)] = RateLimit(
+                limit=int(limit), remaining=int(remaining), reset=float(reset)
+            )
+        retry_after = headers.get("Retry-After", "")
+        if response.status_code in (403, 429) and retry_after.isdigit():
+            # Secondary rate limit: back off everything, not just this token.
+            self._paused_until = max(self._paused_until, time.time() + int(retry_after))
+            logger.warning("GitHub asked to retry after %ss", retry_after)
+
+
+@dataclass
+class CachedResponse:
+    etag: str
+    headers: httpx.Headers
+    content: bytes
+
+    def replay(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers=self.headers, content=self.content, request=request)
+
+
+class ConditionalCache:
+    """The last ETag-carrying response for each (token, URL) GET, so repeat
+    reads go out with ``If-None-Match`` and a 304 (which GitHub doesn't count
+    against the rate limit) is answered from here."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+
+    def get(self, token: str | None, url: str) -> CachedResponse | None:
+        key = (token_key(token), url)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, token: str | None, url: str, response: httpx.Response) -> None:
+        etag = response.headers.get("ETag")
+        if not etag:
+            return
+        # ``content`` is already decoded, so the replay must not claim an
+        # encoding (httpx would try to decompress it again) or the wire length.
+        headers = httpx.Headers(response.headers)
+        for name in ("Content-Encoding", "Content-Length", "Transfer-Encoding"):
+            headers.pop(name, None)
+        key = (token_key(token), url)
+        self._entries[key] = CachedResponse(etag, headers, response.content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -1,23 +1,154 @@
 from __future__ import annotations
 
 import asyncio
+import gzip
+import hashlib
+import importlib.util
 import logging
+import mimetypes
 import os
+import re
+import secrets
+import time
+from collections import OrderedDict
 from contextlib import asynccontextmanager
-from typing import Dict, Iterable, List, Tuple
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Tuple
 from urllib.parse import urlparse
 
 import httpx
 from starlette.applications import Starlette
-from starlette.requests import Request
-from starlette.responses import Response, StreamingResponse
+from starlette.middleware import Middleware
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
 from starlette.routing import Route, WebSocketRoute
+from starlette.types import ASGIApp, Receive, Scope, Send
 from starlette.websockets import WebSocket
 
+from admission import AdmissionController, Rejected, parse_rules
+from metrics import Registry
+from ws_relay import (
+    CLOSE_TRY_AGAIN_LATER,
+    SLOW_CONSUMER_POLICIES,
+    Frame,
+    RelayRegistry,
+    SlowConsumer,
+    relay,
+)
+from worker_pool import Worker, WorkerPool
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional, gzip still works
+    brotli = None
+
 logger = logging.getLogger(__name__)
 
 API_BACKEND = os.environ.get("API_BACKEND", "http://127.0.0.1:8001")
-STREAMLIT_BACKEND = os.environ.get("STREAMLIT_BACKEND", "http://127.0.0.1:8501")
+# A comma-separated STREAMLIT_BACKEND runs a pool of Streamlit workers. Each
+# browser gets a random session cookie that is hashed onto a healthy worker,
+# so the page, its uploads and the /_stcore/stream WebSocket all reach the
+# worker that holds the session. Clients that drop the cookie fall back to
+# their address.
+STREAMLIT_BACKENDS = [
+    backend.strip()
+    for backend in os.environ.get("STREAMLIT_BACKEND", "http://127.0.0.1:8501").split(",")
+    if backend.strip()
+]
+STICKY_COOKIE = os.environ.get("PROXY_STICKY_COOKIE", "proxy_session")
+# Proxies in front of this one that append to X-Forwarded-For (the platform
+# edge). The client address is the entry the outermost of them added; the
+# entries left of it come from the client and can't be trusted. 0 ignores
+# the header and uses the peer address.
+TRUSTED_PROXY_HOPS = int(os.environ.get("PROXY_TRUSTED_HOPS", "1"))
+if TRUSTED_PROXY_HOPS < 0:
+    raise ValueError(f"PROXY_TRUSTED_HOPS must be >= 0, got {TRUSTED_PROXY_HOPS}")
+WORKER_HEALTH_INTERVAL = float(os.environ.get("PROXY_WORKER_HEALTH_INTERVAL", "5"))
+WORKER_HEALTH_PATH = "/_stcore/health"
+
+# Serve the FastAPI app (api:app) inside the proxy's event loop instead of
+# forwarding API paths to a separate uvicorn process on API_BACKEND.
+INPROCESS_API = os.environ.get("PROXY_INPROCESS_API", "0") == "1"
+
+# When the supervisor runs the proxy it binds the port before the backends are
+# up; until it calls mark_ready() for a route ("api" or "streamlit") requests
+# for that route get 503 with Retry-After.
+READINESS_GATE = os.environ.get("PROXY_READINESS_GATE", "0") == "1"
+READINESS_RETRY_AFTER_SECONDS = int(os.environ.get("PROXY_READINESS_RETRY_AFTER", "2"))
+
+# Either backend may be given as unix:///path/to.sock to skip loopback TCP.
+UNIX_SOCKET_PREFIX = "unix://"
+
+# Request bodies are piped to the backend as they arrive instead of being read
+# into memory first. 200 MB matches Streamlit's default `server.maxUploadSize`.
+STREAM_REQUEST_BODIES = os.environ.get("PROXY_STREAM_REQUEST_BODIES", "1") != "0"
+MAX_REQUEST_BODY_BYTES = int(os.environ.get("PROXY_MAX_BODY_BYTES", str(200 * 1024 * 1024)))
+
+# Streamlit's frontend and component bundles are content-hashed, so they are
+# cached in memory here instead of being re-read from the Streamlit server on
+# every page load. A budget of 0 disables the cache.
+STATIC_CACHE_BYTES = int(os.environ.get("PROXY_STATIC_CACHE_BYTES", str(64 * 1024 * 1024)))
+STATIC_CACHE_MAX_ENTRY_BYTES = int(
+    os.environ.get("PROXY_STATIC_CACHE_MAX_ENTRY_BYTES", str(8 * 1024 * 1024))
+)
+STATIC_CACHE_PREFIXES = ("/static/", "/component/")
+
+# Streamlit's and the components' built frontend files are gzip/brotli
+# compressed once at startup and served straight from the proxy. Components are
+# named the way Streamlit registers them: "<module>.<declared name>".
+PRECOMPRESS_ASSETS = os.environ.get("PROXY_PRECOMPRESS_ASSETS", "1") != "0"
+PRECOMPRESS_COMPONENTS = [
+    name.strip()
+    for name in os.environ.get(
+        "PROXY_PRECOMPRESS_COMPONENTS",
+        "streamlit_tags.streamlit_tags,streamlit_pdf_viewer.streamlit_pdf_viewer",
+    ).split(",")
+    if name.strip()
+]
+PRECOMPRESS_MIN_BYTES = 1024
+PRECOMPRESS_EXTENSIONS = {".js", ".mjs", ".css", ".svg", ".json", ".txt", ".ttf", ".wasm"}
+BROTLI_QUALITY = int(os.environ.get("PROXY_BROTLI_QUALITY", "11"))
+IMMUTABLE_CACHE_CONTROL = "public, immutable, max-age=31536000"
+
+# WebSocket relays buffer a bounded number of frames per direction and are
+# capped globally; see ws_relay.py for the slow consumer policies.
+WS_MAX_CONNECTIONS = int(os.environ.get("PROXY_WS_MAX_CONNECTIONS", "1000"))
+WS_BUFFER_FRAMES = int(os.environ.get("PROXY_WS_BUFFER_FRAMES", "64"))
+WS_BUFFER_BYTES = int(os.environ.get("PROXY_WS_BUFFER_BYTES", str(8 * 1024 * 1024)))
+WS_SLOW_CONSUMER_POLICY = os.environ.get("PROXY_WS_SLOW_CONSUMER_POLICY", "pause")
+if WS_SLOW_CONSUMER_POLICY not in SLOW_CONSUMER_POLICIES:
+    raise ValueError(
+        f"PROXY_WS_SLOW_CONSUMER_POLICY must be one of {SLOW_CONSUMER_POLICIES}, "
+        f"got {WS_SLOW_CONSUMER_POLICY!r}"
+    )
+
+# Token buckets and concurrency limits per path prefix, keyed by client
+# address or, once it matches API_KEY, X-API-Key (see admission.AdmissionRule
+# for the fields). Requests over the limit wait up to queue_timeout, then get
+# 429 with Retry-After; WebSockets are closed with 1013. PROXY_ADMISSION_RULES="[]" disables it.
+DEFAULT_ADMISSION_RULES = """[
+    {"prefix": "/push-metadata", "key": "api_key", "rate": 0.2, "burst": 5,
+     "concurrency": 2, "total_concurrency": 8, "queue": 8, "queue_timeout": 10},
+    {"prefix": "/_stcore/stream", "key": "ip", "rate": 0.5, "burst": 10,
+     "concurrency": 20, "queue": 4, "queue_timeout": 2}
+]"""
+ADMISSION_RULES = parse_rules(os.environ.get("PROXY_ADMISSION_RULES", DEFAULT_ADMISSION_RULES))
+
+# Prometheus text metrics; an empty path turns the endpoint off.
+METRICS_PATH = os.environ.get("PROXY_METRICS_PATH", "/_proxy/metrics")
+UPSTREAM_MAX_CONNECTIONS = 100
+
+# Response headers that describe a cached body and are repeated on a 304.
+NOT_MODIFIED_HEADERS = {
+    "cache-control",
+    "content-location",
+    "etag",
+    "expires",
+    "last-modified",
+    "vary",
+}
 
 HOP_BY_HOP = {
     "connection",
@@ -46,6 +177,8 @@ WS_FORWARD_HEADERS = {
     "accept-language",
 }
 
+UPSTREAM_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
 STREAM_ERRORS = (
     httpx.ReadError,
     httpx.RemoteProtocolError,
@@ -55,7 +188,164 @@ STREAM_ERRORS = (
 )
 
 
+METRICS = Registry()
+REQUEST_DURATION = METRICS.histogram(
+    "proxy_http_request_duration_seconds",
+    "Time from receiving a proxied request to the end of its response body.",
+    ["backend"],
+)
+UPSTREAM_RESPONSES = METRICS.counter(
+    "proxy_upstream_responses_total", "Upstream HTTP responses by status code.", ["backend", "code"]
+)
+LOCAL_RESPONSES = METRICS.counter(
+    "proxy_local_responses_total",
+    "Responses answered from the proxy's precompressed assets or static cache.",
+    ["source", "code"],
+)
+REQUEST_BYTES = METRICS.counter(
+    "proxy_request_body_bytes_total", "Request body bytes streamed to a backend.", ["backend"]
+)
+RESPONSE_BYTES = METRICS.counter(
+    "proxy_response_body_bytes_total", "Response body bytes streamed from a backend.", ["backend"]
+)
+UPSTREAM_INFLIGHT = METRICS.gauge(
+    "proxy_upstream_inflight_requests", "Upstream HTTP requests holding a pool connection."
+)
+UPSTREAM_POOL_SIZE = METRICS.gauge(
+    "proxy_upstream_pool_max_connections",
+    "Upstream HTTP connection pool size.",
+    function=lambda: UPSTREAM_MAX_CONNECTIONS,
+)
+CONNECT_FAILURES = METRICS.counter(
+    "proxy_upstream_connect_failures_total", "Failed upstream connects.", ["backend", "protocol"]
+)
+WS_ACTIVE = METRICS.gauge("proxy_websocket_relays_active", "Open WebSocket relays.")
+WS_TOTAL = METRICS.counter("proxy_websocket_relays_total", "WebSocket relays opened.")
+WS_REJECTED = METRICS.counter(
+    "proxy_websocket_relays_rejected_total", "WebSocket relays refused by PROXY_WS_MAX_CONNECTIONS."
+)
+WS_SHED = METRICS.counter(
+    "proxy_websocket_relays_shed_total", "WebSocket clients closed for reading too slowly."
+)
+WS_DURATION = METRICS.histogram(
+    "proxy_websocket_relay_duration_seconds",
+    "Lifetime of closed WebSocket relays.",
+    buckets=(1, 5, 15, 60, 300, 900, 1800, 3600, 7200, 14400),
+)
+WS_FRAMES = METRICS.counter(
+    "proxy_websocket_frames_total", "Frames relayed over WebSockets.", ["direction"]
+)
+WS_BYTES = METRICS.counter(
+    "proxy_websocket_bytes_total", "Payload bytes relayed over WebSockets.", ["direction"]
+)
+STATIC_CACHE_EVENTS = METRICS.counter(
+    "proxy_static_cache_requests_total", "Static cache lookups by outcome.", ["outcome"]
+)
+STATIC_CACHE_SIZE = METRICS.gauge("proxy_static_cache_bytes", "Bytes held by the static cache.")
+PRECOMPRESSED_FILES = METRICS.gauge(
+    "proxy_precompressed_files", "Frontend files available precompressed."
+)
+ADMISSION_ADMITTED = METRICS.counter(
+    "proxy_admission_admitted_total", "Requests admitted by the admission rules.", ["rule"]
+)
+ADMISSION_QUEUED = METRICS.counter(
+    "proxy_admission_queued_total", "Admitted or rejected requests that had to wait.", ["rule"]
+)
+ADMISSION_REJECTED = METRICS.counter(
+    "proxy_admission_rejected_total", "Requests refused by the admission rules.", ["rule", "reason"]
+)
+ADMISSION_ACTIVE = METRICS.gauge(
+    "proxy_admission_active", "Admitted requests still in flight.", ["rule"]
+)
+ADMISSION_WAITING = METRICS.gauge(
+    "proxy_admission_waiting", "Requests waiting for a token or a slot.", ["rule"]
+)
+WORKER_UP = METRICS.gauge(
+    "proxy_streamlit_worker_up", "1 while a Streamlit worker receives new sessions.", ["worker"]
+)
+WORKER_SESSIONS = METRICS.counter(
+    "proxy_streamlit_worker_sessions_total", "WebSocket sessions routed to each Streamlit worker.", ["worker"]
+)
+
+
+def bind_app_metrics(app: Starlette) -> None:
+    """Point scrape-time metrics at this app's caches and relay registry."""
+    relays: RelayRegistry = app.state.ws_relays
+    cache = app.state.static_cache
+
+    WS_ACTIVE.set_function(lambda: len(relays.active))
+    WS_TOTAL.set_function(lambda: relays.total)
+    WS_REJECTED.set_function(lambda: relays.rejected)
+    WS_SHED.set_function(lambda: relays.shed)
+
+    def traffic(kind: str):
+        def collect():
+            totals = relays.traffic()
+            return {
+                ("upstream",): totals[f"{kind}_to_upstream"],
+                ("client",): totals[f"{kind}_to_client"],
+            }
+
+        return collect
+
+    WS_FRAMES.set_function(traffic("frames"))
+    WS_BYTES.set_function(traffic("bytes"))
+    STATIC_CACHE_EVENTS.set_function(
+        lambda: {("hit",): cache.hits, ("miss",): cache.misses, ("coalesced",): cache.coalesced}
+    )
+    STATIC_CACHE_SIZE.set_function(lambda: cache.size)
+    PRECOMPRESSED_FILES.set_function(lambda: len(app.state.precompressed.variants))
+    admission: AdmissionController = app.state.admission
+    ADMISSION_ADMITTED.set_function(
+        lambda: {(rule,): counters.admitted for rule, counters in admission.counters()}
+    )
+    ADMISSION_QUEUED.set_function(
+        lambda: {(rule,): counters.queued for rule, counters in admission.counters()}
+    )
+    ADMISSION_REJECTED.set_function(
+        lambda: {
+            (rule, reason): count
+            for rule, counters in admission.counters()
+            for reason, count in counters.rejected.items()
+        }
+    )
+    ADMISSION_ACTIVE.set_function(
+        lambda: {(rule,): counters.active for rule, counters in admission.counters()}
+    )
+    ADMISSION_WAITING.set_function(
+        lambda: {(rule,): counters.waiting for rule, counters in admission.counters()}
+    )
+    pool: WorkerPool = app.state.streamlit_pool
+    WORKER_UP.set_function(lambda: {(worker.label,): int(worker.healthy) for worker in pool.workers})
+    WORKER_SESSIONS.set_function(lambda: {(worker.label,): worker.sessions for worker in pool.workers})
+
+
+class RequestBodyTooLarge(Exception):
+    pass
+
+
+def backend_socket_path(backend: str) -> str | None:
+    if backend.startswith(UNIX_SOCKET_PREFIX):
+        return backend[len(UNIX_SOCKET_PREFIX) :]
+    return None
+
+
+def uds_placeholder_host(socket_path: str) -> str:
+    # httpx routes UDS traffic by URL through a mounted transport, so each
+    # socket gets a stable made-up host name that never hits DNS.
+    return f"uds-{hashlib.sha1(socket_path.encode()).hexdigest()[:12]}.localhost"
+
+
+def backend_base_url(backend: str) -> str:
+    socket_path = backend_socket_path(backend)
+    if socket_path is None:
+        return backend.rstrip("/")
+    return f"http://{uds_placeholder_host(socket_path)}"
+
+
 def backend_host_header(backend_url: str) -> str:
+    if backend_socket_path(backend_url) is not None:
+        return "localhost"
     parsed = urlparse(backend_url)
     port = parsed.port
     if port is None:
@@ -68,13 +358,58 @@ def is_api_path(path: str) -> bool:
         path == "/health"
         or path == "/openapi.json"
         or path.startswith("/push-metadata")
+        or path.startswith("/jobs/")
         or path.startswith("/docs")
         or path.startswith("/redoc")
     )
 
 
-def pick_backend(path: str) -> str:
-    return API_BACKEND if is_api_path(path) else STREAMLIT_BACKEND
+def client_address(conn: HTTPConnection) -> str:
+    peer = conn.client.host if conn.client else ""
+    if TRUSTED_PROXY_HOPS == 0:
+        return peer
+    hops = [hop.strip() for hop in conn.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if not hops:
+        return peer
+    # A chain shorter than the trusted hops was written entirely by them.
+    return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+
+
+def sticky_session_key(conn: HTTPConnection) -> Tuple[str, str | None]:
+    """Return the key to route this client by and, for a client without a
+    session cookie yet, the cookie value to hand out."""
+    session = conn.cookies.get(STICKY_COOKIE)
+    if session:
+        return session, None
+    # Until the cookie comes back, a client's HTTP requests (uploads, media)
+    # and its WebSocket are all routed by its address so they meet on the
+    # same worker; the cookie then keeps that worker if the address changes.
+    session = hashlib.sha256(client_address(conn).encode()).hexdigest()[:22]
+    if conn.scope["type"] == "websocket":
+        return session, None
+    return session, session
+
+
+def set_sticky_cookie(request: Request, response: Response, session: str) -> None:
+    scheme = request.headers.get("x-forwarded-proto") or request.url.scheme
+    response.set_cookie(
+        STICKY_COOKIE,
+        session,
+        path="/",
+        httponly=True,
+        secure=scheme == "https",
+        samesite="lax",
+    )
+
+
+async def probe_worker(client: httpx.AsyncClient, worker: Worker) -> bool:
+    try:
+        response = await client.get(
+            f"{backend_base_url(worker.url)}{WORKER_HEALTH_PATH}", timeout=2.0
+        )
+    except httpx.HTTPError:
+        return False
+    return response.status_code == 200
 
 
 def filtered_headers(headers: Iterable[Tuple[str, str]]) -> Dict[str, str]:
@@ -124,58 +459,740 @@ def client_origin(scope: dict) -> str | None:
     return None
 
 
+def declared_body_length(request: Request) -> int | None:
+    value = request.headers.get("content-length")
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def request_has_body(request: Request) -> bool:
+    if "transfer-encoding" in request.headers:
+        return True
+    return bool(declared_body_length(request))
+
+
+async def limited_body_stream(request: Request, limit: int, label: str) -> AsyncIterator[bytes]:
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if limit and received > limit:
+            raise RequestBodyTooLarge()
+        if chunk:
+            REQUEST_BYTES.inc(label, amount=len(chunk))
+            yield chunk
+
+
+def body_too_large_response() -> Response:
+    return PlainTextResponse(
+        f"Request body exceeds the {MAX_REQUEST_BODY_BYTES} byte limit.",
+        status_code=413,
+        headers={"Connection": "close"},
+    )
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes
+    etag: str
+    last_modified: str | None = None
+    cacheable: bool = True
+
+
+@dataclass
+class UncachedAsset:
+    """An upstream response too big for the cache, handed to the caller that
+    fetched it so it is streamed on instead of being requested again."""
+
+    upstream: httpx.Response
+    body: AsyncIterator[bytes]
+
+
+class StaticAssetCache:
+    """Byte-budgeted LRU of static asset responses.
+
+    Concurrent misses for the same key share one upstream fetch: the first
+    caller runs the loader and everyone else awaits its result.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def get(self, key: str) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        size = len(entry.body)
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous.body)
+        self._entries[key] = entry
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.body)
+
+    async def fetch(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[CachedResponse | UncachedAsset]],
+    ) -> CachedResponse | UncachedAsset | None:
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = await loader()
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Waiters re-raise it; keep the loop from warning when there are none.
+            future.exception()
+            raise
+        else:
+            # An uncached response can only be streamed to one client; the
+            # callers that waited for it fetch their own.
+            future.set_result(entry if isinstance(entry, CachedResponse) else None)
+        finally:
+            self._inflight.pop(key, None)
+
+        if isinstance(entry, CachedResponse) and entry.cacheable:
+            self.put(key, entry)
+        return entry
+
+
+def is_static_asset_path(path: str) -> bool:
+    return path.startswith(STATIC_CACHE_PREFIXES)
+
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+def is_cacheable_response(status_code: int, headers: httpx.Headers) -> bool:
+    if status_code != 200 or "set-cookie" in headers:
+        return False
+    directives = {
+        part.strip().split("=", 1)[0]
+        for part in headers.get("cache-control", "").lower().split(",")
+        if part.strip()
+    }
+    if directives & {"no-store", "no-cache", "private"}:
+        return False
+    return bool(directives & {"public", "immutable", "max-age"})
+
+
+def strip_weak_etag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def is_not_modified(request: Request, entry: CachedResponse) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {strip_weak_etag(tag.strip()) for tag in if_none_match.split(",")}
+        return "*" in candidates or strip_weak_etag(entry.etag) in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and entry.last_modified:
+        try:
+            return parsedate_to_datetime(entry.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cached_asset_response(request: Request, entry: CachedResponse) -> Response:
+    if entry.status_code == 200 and is_not_modified(request, entry):
+        headers = {
+            key: value for key, value in entry.headers.items() if key.lower() in NOT_MODIFIED_HEADERS
+        }
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, status_code=entry.status_code, headers=entry.headers)
+
+
+async def load_static_asset(
+    client: httpx.AsyncClient, request: Request, backend: str, url: str, gzip: bool
+) -> CachedResponse | UncachedAsset:
+    headers = upstream_http_headers(request, backend)
+    for key in list(headers):
+        if key.lower() in {"if-none-match", "if-modified-since", "range", "accept-encoding", "cookie"}:
+            del headers[key]
+    headers["Accept-Encoding"] = "gzip" if gzip else "identity"
+
+    upstream = await client.send(client.build_request("GET", url, headers=headers), stream=True)
+    UPSTREAM_RESPONSES.inc("streamlit", str(upstream.status_code))
+    raw = upstream.aiter_raw()
+    chunks: List[bytes] = []
+    try:
+        length = upstream.headers.get("content-length")
+        too_big = length is not None and length.isdigit() and int(length) > STATIC_CACHE_MAX_ENTRY_BYTES
+        if not too_big:
+            # Streamlit chunks (and gzips) its larger files, so without a
+            # Content-Length the body is read until it turns out too big.
+            size = 0
+            async for chunk in raw:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > STATIC_CACHE_MAX_ENTRY_BYTES:
+                    too_big = True
+                    break
+    except BaseException:
+        await upstream.aclose()
+        raise
+    if too_big:
+
+        async def body() -> AsyncIterator[bytes]:
+            for chunk in chunks:
+                yield chunk
+            async for chunk in raw:
+                yield chunk
+
+        return UncachedAsset(upstream, body())
+    await upstream.aclose()
+    body = b"".join(chunks)
+
+    response_headers = {
+        key: value
+        for key, value in filtered_headers(upstream.headers.items()).items()
+        if key.lower() not in {"content-length", "date", "server", "set-cookie"}
+    }
+    etag = upstream.headers.get("etag")
+    if not etag:
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        response_headers["ETag"] = etag
+    return CachedResponse(
+        status_code=upstream.status_code,
+        headers=response_headers,
+        body=body,
+        etag=etag,
+        last_modified=upstream.headers.get("last-modified"),
+        cacheable=is_cacheable_response(upstream.status_code, upstream.headers),
+    )
+
+
+async def proxy_static_asset(
+    request: Request, backend: str, url: str
+) -> Response | UncachedAsset | None:
+    cache: StaticAssetCache = request.app.state.static_cache
+    client: httpx.AsyncClient = request.app.state.http
+    gzip = accepts_gzip(request)
+    key = f"{'gzip' if gzip else 'identity'} {url}"
+    if request.method == "HEAD":
+        entry = cache.get(key)
+    else:
+        entry = await cache.fetch(
+            key, lambda: load_static_asset(client, request, backend, url, gzip)
+        )
+    if entry is None or isinstance(entry, UncachedAsset):
+        return entry
+    return cached_asset_response(request, entry)
+
+
+def package_dir(module_name: str) -> Path | None:
+    # find_spec locates the package without importing it (and Streamlit with it).
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or not spec.origin:
+        return None
+    return Path(spec.origin).resolve().parent
+
+
+def component_build_dir(component_name: str) -> Path | None:
+    root = package_dir(component_name.split(".", 1)[0])
+    if root is None:
+        return None
+    for candidate in ("frontend/build", "frontend/dist"):
+        if (root / candidate).is_dir():
+            return root / candidate
+    return None
+
+
+def asset_sources() -> List[Tuple[str, Path, str]]:
+    """(URL prefix, directory, Cache-Control) for every bundle we precompress."""
+    sources: List[Tuple[str, Path, str]] = []
+    streamlit_dir = package_dir("streamlit")
+    if streamlit_dir is not None and (streamlit_dir / "static" / "static").is_dir():
+        sources.append(("/static/", streamlit_dir / "static" / "static", IMMUTABLE_CACHE_CONTROL))
+    for name in PRECOMPRESS_COMPONENTS:
+        build_dir = component_build_dir(name)
+        if build_dir is not None:
+            # Streamlit's component handler marks non-HTML files as plain "public".
+            sources.append((f"/component/{name}/", build_dir, "public"))
+    return sources
+
+
+def preload_link_header(index_html: str) -> str | None:
+    links = []
+    for tag in re.findall(r"<script\b[^>]*>", index_html):
+        src = re.search(r'src="\.?(/static/[^"]+)"', tag)
+        if src:
+            rel = "modulepreload" if 'type="module"' in tag else "preload; as=script"
+            links.append(f"<{src.group(1)}>; rel={rel}; crossorigin")
+    for tag in re.findall(r"<link\b[^>]*>", index_html):
+        href = re.search(r'href="\.?(/static/[^"]+\.css)"', tag)
+        if href and 'rel="stylesheet"' in tag:
+            links.append(f"<{href.group(1)}>; rel=preload; as=style; crossorigin")
+    return ", ".join(links) or None
+
+
+def preferred_encodings(accept_encoding: str) -> List[str]:
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            weights[coding] = quality
+    candidates = [coding for coding in ("br", "gzip") if coding in weights or "*" in weights]
+    return sorted(candidates, key=lambda coding: -weights.get(coding, weights.get("*", 0)))
+
+
+class PrecompressedAssets:
+    """Gzip and brotli variants of the frontend bundles, keyed by URL path.
+
+    Built in a worker thread after startup; until a file is ready its
+    requests keep going to Streamlit.
+    """
+
+    def __init__(self) -> None:
+        self.variants: Dict[str, Dict[str, CachedResponse]] = {}
+        self.preload_links: str | None = None
+        self.size = 0
+        self._stopped = False
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def build(self) -> None:
+        streamlit_dir = package_dir("streamlit")
+        if streamlit_dir is not None:
+            index = streamlit_dir / "static" / "index.html"
+            try:
+                self.preload_links = preload_link_header(index.read_text(encoding="utf-8"))
+            except OSError:
+                pass
+
+        files = []
+        for prefix, directory, cache_control in asset_sources():
+            for path in sorted(directory.rglob("*")):
+                if path.is_file() and path.suffix.lower() in PRECOMPRESS_EXTENSIONS:
+                    url_path = prefix + path.relative_to(directory).as_posix()
+                    files.append((url_path, path, cache_control))
+
+        # gzip everything first since it is fast, then spend the time on brotli
+        # starting with the bundles the index page preloads.
+        critical = self.preload_links or ""
+        files.sort(key=lambda item: f"<{item[0]}>" not in critical)
+        encodings = ["gzip", "br"] if brotli is not None else ["gzip"]
+        for encoding in encodings:
+            for url_path, path, cache_control in files:
+                if self._stopped:
+                    return
+                try:
+                    self.add(url_path, path, cache_control, encoding)
+                except OSError as exc:
+                    logger.warning("Could not precompress %s: %s", path, exc)
+        logger.info("Precompressed %d frontend files (%d bytes)", len(self.variants), self.size)
+
+    def add(self, url_path: str, path: Path, cache_control: str, encoding: str) -> None:
+        raw = path.read_bytes()
+        if len(raw) < PRECOMPRESS_MIN_BYTES:
+            return
+        if encoding == "br":
+            body = brotli.compress(raw, quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(raw, compresslevel=9, mtime=0)
+        if len(body) >= len(raw):
+            return
+
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type = f"{content_type}; charset=utf-8"
+        etag = f'"{hashlib.sha1(raw).hexdigest()[:20]}-{encoding}"'
+        self.variants.setdefault(url_path, {})[encoding] = CachedResponse(
+            status_code=200,
+            headers={
+                "Content-Type": content_type,
+                "Content-Encoding": encoding,
+                "Cache-Control": cache_control,
+                "ETag": etag,
+                "Vary": "Accept-Encoding",
+            },
+            body=body,
+            etag=etag,
+        )
+        self.size += len(body)
+
+    def response(self, request: Request) -> Response | None:
+        variants = self.variants.get(request.url.path)
+        if not variants:
+            return None
+        for encoding in preferred_encodings(request.headers.get("accept-encoding", "")):
+            entry = variants.get(encoding)
+            if entry is not None:
+                return cached_asset_response(request, entry)
+        return None
+
+
+class Readiness:
+    """Which routes can't be served yet, with the reason for each."""
+
+    def __init__(self, routes: List[str]):
+        self.unready: Dict[str, str] = {route: "starting" for route in routes}
+
+    @property
+    def ready(self) -> bool:
+        return not self.unready
+
+    def reason(self, route: str) -> str | None:
+        return self.unready.get(route)
+
+    def mark_ready(self, route: str) -> None:
+        self.unready.pop(route, None)
+
+    def mark_unready(self, route: str, reason: str) -> None:
+        self.unready[route] = reason
+
+
+def readiness_route(path: str) -> str:
+    if is_api_path(path) and not INPROCESS_API:
+        return "api"
+    return "streamlit"
+
+
+readiness = Readiness(
+    (["streamlit"] if INPROCESS_API else ["api", "streamlit"]) if READINESS_GATE else []
+)
+streamlit_pool = WorkerPool(STREAMLIT_BACKENDS)
+
+
+class ReadinessGateMiddleware:
+    """Answer 503 + Retry-After (or close WebSockets with 1013) while the
+    backend for the request's route is not ready; the other route keeps
+    serving. The metrics endpoint stays reachable."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            readiness.ready
+            or scope["type"] not in ("http", "websocket")
+            or (METRICS_PATH and scope["path"] == METRICS_PATH)
+        ):
+            await self.app(scope, receive, send)
+            return
+        reason = readiness.reason(readiness_route(scope["path"]))
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": CLOSE_TRY_AGAIN_LATER})
+            return
+        response = PlainTextResponse(
+            f"Service unavailable: {reason}. Try again shortly.",
+            status_code=503,
+            headers={"Retry-After": str(READINESS_RETRY_AFTER_SECONDS)},
+        )
+        await response(scope, receive, send)
+
+
+def admission_key(conn: HTTPConnection, source: str) -> str:
+    # Only a key the API will accept names a client; anything else would let
+    # a caller mint a fresh bucket per request by varying the header.
+    if source == "api_key":
+        api_key = conn.headers.get("x-api-key") or ""
+        expected = (os.getenv("API_KEY") or "").strip()
+        if expected and secrets.compare_digest(api_key.encode(), expected.encode()):
+            return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    return "ip:" + client_address(conn)
+
+
+class AdmissionMiddleware:
+    """Apply the admission rules before a request reaches a backend."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        admission: AdmissionController = scope["app"].state.admission
+        limiter = admission.match(scope["path"])
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        key = admission_key(HTTPConnection(scope), limiter.rule.key)
+        try:
+            async with limiter.admit(key):
+                await self.app(scope, receive, send)
+        except Rejected as exc:
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": CLOSE_TRY_AGAIN_LATER})
+                return
+            response = PlainTextResponse(
+                "Too many requests. Try again shortly.",
+                status_code=429,
+                headers={"Retry-After": exc.retry_after_header},
+            )
+            await response(scope, receive, send)
+
+
+class InProcessApiMiddleware:
+    """Dispatch API paths straight into the FastAPI app as an ASGI sub-app."""
+
+    def __init__(self, app: ASGIApp, api_app: ASGIApp):
+        self.app = app
+        self.api_app = api_app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in ("http", "websocket") and is_api_path(scope["path"]):
+            await self.api_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+def load_inprocess_api():
+    # Imported lazily so the standalone proxy doesn't pull in the API's
+    # dependencies (FastAPI, dotenv, ...).
+    from api import app as api_app
+
+    return api_app
+
+
 @asynccontextmanager
 async def lifespan(app: Starlette):
+    limits = httpx.Limits(max_connections=UPSTREAM_MAX_CONNECTIONS, max_keepalive_connections=20)
+    mounts = {}
+    for backend in (API_BACKEND, *STREAMLIT_BACKENDS):
+        socket_path = backend_socket_path(backend)
+        if socket_path is not None:
+            mounts[f"http://{uds_placeholder_host(socket_path)}"] = httpx.AsyncHTTPTransport(
+                uds=socket_path, limits=limits
+            )
     app.state.http = httpx.AsyncClient(
         timeout=httpx.Timeout(300.0),
-        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        limits=limits,
+        mounts=mounts,
     )
+    app.state.static_cache = StaticAssetCache(STATIC_CACHE_BYTES, STATIC_CACHE_MAX_ENTRY_BYTES)
+    app.state.precompressed = PrecompressedAssets()
+    app.state.ws_relays = RelayRegistry(WS_MAX_CONNECTIONS)
+    app.state.streamlit_pool = streamlit_pool
+    app.state.admission = AdmissionController(ADMISSION_RULES)
+    bind_app_metrics(app)
+    if PRECOMPRESS_ASSETS:
+        asyncio.get_running_loop().run_in_executor(None, app.state.precompressed.build)
+    health_checks = None
+    if len(streamlit_pool) > 1:
+        health_checks = asyncio.create_task(
+            streamlit_pool.run_health_checks(
+                lambda worker: probe_worker(app.state.http, worker), WORKER_HEALTH_INTERVAL
+            )
+        )
     try:
-        yield
+        if INPROCESS_API:
+            api_app = load_inprocess_api()
+            async with api_app.router.lifespan_context(api_app):
+                yield
+        else:
+            yield
     finally:
+        if health_checks is not None:
+            health_checks.cancel()
+            await asyncio.gather(health_checks, return_exceptions=True)
+        app.state.precompressed.stop()
         await app.state.http.aclose()
 
 
+def bad_gateway_response() -> Response:
+    return PlainTextResponse("Bad Gateway: backend unavailable.", status_code=502)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return PlainTextResponse(
+        METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 async def proxy_http(request: Request) -> Response:
+    started = time.perf_counter()
     client: httpx.AsyncClient = request.app.state.http
-    backend = pick_backend(request.url.path)
-    url = f"{backend}{request.url.path}"
+    worker = new_session = None
+    # The metrics label follows the routing decision, not the URL: both
+    # backends may be the same address (as in bench/run.py).
+    if is_api_path(request.url.path):
+        backend, label = API_BACKEND, "api"
+    else:
+        session, new_session = sticky_session_key(request)
+        worker = streamlit_pool.pick(session)
+        backend, label = worker.url, "streamlit"
+    url = f"{backend_base_url(backend)}{request.url.path}"
     if request.url.query:
         url = f"{url}?{request.url.query}"
+    prefetched: UncachedAsset | None = None
 
-    upstream = await client.send(
-        client.build_request(
-            request.method,
-            url,
-            headers=upstream_http_headers(request, backend),
-            content=await request.body(),
-        ),
-        stream=True,
-    )
+    if (
+        worker is not None
+        and request.method in ("GET", "HEAD")
+        and is_static_asset_path(request.url.path)
+        and "range" not in request.headers
+    ):
+        precompressed = request.app.state.precompressed.response(request)
+        if precompressed is not None:
+            LOCAL_RESPONSES.inc("precompressed", str(precompressed.status_code))
+            return precompressed
+        if STATIC_CACHE_BYTES:
+            try:
+                cached = await proxy_static_asset(request, backend, url)
+            except UPSTREAM_CONNECT_ERRORS:
+                CONNECT_FAILURES.inc(label, "http")
+                streamlit_pool.set_health(worker, False, "connect failed")
+                return bad_gateway_response()
+            if isinstance(cached, UncachedAsset):
+                prefetched = cached
+            elif cached is not None:
+                LOCAL_RESPONSES.inc("static_cache", str(cached.status_code))
+                return cached
+
+    if prefetched is not None:
+        UPSTREAM_INFLIGHT.inc()
+        upstream, body = prefetched.upstream, prefetched.body
+    else:
+        response = await send_upstream(request, client, backend, url, label, worker)
+        if isinstance(response, Response):
+            return response
+        upstream, body = response, response.aiter_raw()
 
     async def stream():
+        sent = 0
         try:
-            async for chunk in upstream.aiter_raw():
+            async for chunk in body:
                 if await request.is_disconnected():
                     break
+                sent += len(chunk)
                 yield chunk
         except STREAM_ERRORS:
             pass
         finally:
             await upstream.aclose()
+            UPSTREAM_INFLIGHT.dec()
+            RESPONSE_BYTES.inc(label, amount=sent)
+            REQUEST_DURATION.observe(time.perf_counter() - started, label)
 
-    return StreamingResponse(
+    response_headers = filtered_headers(upstream.headers.items())
+    preload_links = request.app.state.precompressed.preload_links
+    if (
+        preload_links
+        and worker is not None
+        and request.method == "GET"
+        and upstream.headers.get("content-type", "").startswith("text/html")
+        and not request.url.path.startswith("/component/")
+    ):
+        response_headers["Link"] = preload_links
+
+    response = StreamingResponse(
         stream(),
         status_code=upstream.status_code,
-        headers=filtered_headers(upstream.headers.items()),
+        headers=response_headers,
     )
+    if new_session is not None and len(streamlit_pool) > 1:
+        set_sticky_cookie(request, response, new_session)
+    return response
+
+
+async def send_upstream(
+    request: Request,
+    client: httpx.AsyncClient,
+    backend: str,
+    url: str,
+    label: str,
+    worker: Worker | None,
+) -> httpx.Response | Response:
+    """Forward the request; returns the streaming upstream response (counted
+    in UPSTREAM_INFLIGHT) or the error response to send instead."""
+    declared = declared_body_length(request)
+    if MAX_REQUEST_BODY_BYTES and declared is not None and declared > MAX_REQUEST_BODY_BYTES:
+        return body_too_large_response()
+
+    if not request_has_body(request):
+        content = None
+    elif STREAM_REQUEST_BODIES:
+        content = limited_body_stream(request, MAX_REQUEST_BODY_BYTES, label)
+    else:
+        content = await request.body()
+        if MAX_REQUEST_BODY_BYTES and len(content) > MAX_REQUEST_BODY_BYTES:
+            return body_too_large_response()
+        REQUEST_BYTES.inc(label, amount=len(content))
+
+    UPSTREAM_INFLIGHT.inc()
+    try:
+        upstream = await client.send(
+            client.build_request(
+                request.method,
+                url,
+                headers=upstream_http_headers(request, backend),
+                content=content,
+            ),
+            stream=True,
+        )
+    except RequestBodyTooLarge:
+        UPSTREAM_INFLIGHT.dec()
+        return body_too_large_response()
+    except UPSTREAM_CONNECT_ERRORS:
+        UPSTREAM_INFLIGHT.dec()
+        CONNECT_FAILURES.inc(label, "http")
+        if worker is not None:
+            streamlit_pool.set_health(worker, False, "connect failed")
+        return bad_gateway_response()
+    except BaseException:
+        UPSTREAM_INFLIGHT.dec()
+        raise
+    UPSTREAM_RESPONSES.inc(label, str(upstream.status_code))
+    return upstream
 
 
 async def proxy_websocket(websocket: WebSocket) -> None:
     import websockets as ws_client
 
-    backend = STREAMLIT_BACKEND
-    streamlit_ws = backend.replace("http://", "ws://").replace("https://", "wss://")
+    session, _ = sticky_session_key(websocket)
+    worker = streamlit_pool.pick(session)
+    backend = worker.url
+    socket_path = backend_socket_path(backend)
+    if socket_path is not None:
+        streamlit_ws = "ws://localhost"
+    else:
+        streamlit_ws = backend.replace("http://", "ws://").replace("https://", "wss://")
     path = websocket.url.path or "/"
     if websocket.url.query:
         path = f"{path}?{websocket.url.query}"
@@ -185,67 +1202,95 @@ async def proxy_websocket(websocket: WebSocket) -> None:
     upstream_headers = websocket_upstream_headers(websocket.scope)
     origin = client_origin(websocket.scope)
 
+    registry: RelayRegistry = websocket.app.state.ws_relays
+    relay_id = registry.try_acquire(target)
+    if relay_id is None:
+        logger.warning("WebSocket relay limit (%d) reached, rejecting %s", WS_MAX_CONNECTIONS, target)
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+        return
+
+    connect_options = dict(
+        additional_headers=upstream_headers or None,
+        origin=origin,
+        subprotocols=subprotocols or None,
+        max_size=None,
+        ping_interval=20,
+        ping_timeout=20,
+        open_timeout=20,
+    )
     try:
-        upstream = await ws_client.connect(
-            target,
-            additional_headers=upstream_headers or None,
-            origin=origin,
-            subprotocols=subprotocols or None,
-            max_size=None,
-            ping_interval=20,
-            ping_timeout=20,
-            open_timeout=20,
-        )
+        if socket_path is not None:
+            upstream = await ws_client.unix_connect(socket_path, target, **connect_options)
+        else:
+            upstream = await ws_client.connect(target, **connect_options)
     except Exception as exc:
         logger.warning("WebSocket upstream connect failed for %s: %s", target, exc)
+        CONNECT_FAILURES.inc("streamlit", "websocket")
+        if isinstance(exc, OSError):
+            streamlit_pool.set_health(worker, False, "connect failed")
+        registry.release(relay_id)
         await websocket.close(code=1011)
         return
 
     await websocket.accept(subprotocol=upstream.subprotocol)
+    worker.sessions += 1
 
-    try:
+    async def receive_client() -> Frame | None:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return None
+            if message["type"] != "websocket.receive":
+                continue
+            text = message.get("text")
+            return text if text is not None else message["bytes"]
 
-        async def client_to_upstream() -> None:
-            try:
-                while True:
-                    message = await websocket.receive()
-                    if message["type"] == "websocket.disconnect":
-                        await upstream.close()
-                        break
-                    if message["type"] != "websocket.receive":
-                        continue
-                    text = message.get("text")
-                    if text is not None:
-                        await upstream.send(text)
-                    else:
-                        await upstream.send(message["bytes"])
-            except Exception:
-                pass
+    async def send_client(frame: Frame) -> None:
+        if isinstance(frame, str):
+            await websocket.send_text(frame)
+        else:
+            await websocket.send_bytes(frame)
 
-        async def upstream_to_client() -> None:
-            try:
-                async for message in upstream:
-                    if isinstance(message, str):
-                        await websocket.send_text(message)
-                    else:
-                        await websocket.send_bytes(message)
-            except Exception:
-                pass
+    async def receive_upstream() -> Frame | None:
+        try:
+            return await upstream.recv()
+        except ws_client.ConnectionClosed:
+            return None
 
-        tasks = [
-            asyncio.create_task(client_to_upstream()),
-            asyncio.create_task(upstream_to_client()),
-        ]
-        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-        for task in pending:
-            task.cancel()
-        await asyncio.gather(*done, return_exceptions=True)
+    close_code = 1000
+    stats = registry.active[relay_id]
+    try:
+        await relay(
+            stats,
+            receive_client=receive_client,
+            send_client=send_client,
+            receive_upstream=receive_upstream,
+            send_upstream=upstream.send,
+            buffer_frames=WS_BUFFER_FRAMES,
+            buffer_bytes=WS_BUFFER_BYTES,
+            slow_consumer_policy=WS_SLOW_CONSUMER_POLICY,
+        )
+    except SlowConsumer:
+        close_code = CLOSE_TRY_AGAIN_LATER
+        logger.warning("Closing slow WebSocket client for %s", target)
     except Exception as exc:
         logger.warning("WebSocket proxy relay failed for %s: %s", target, exc)
     finally:
+        registry.release(relay_id)
+        WS_DURATION.observe(stats.duration)
+        logger.debug(
+            "WebSocket relay %s closed (%s) after %.1fs: %d frames/%d bytes up, %d frames/%d bytes down",
+            target,
+            stats.close_reason,
+            stats.duration,
+            stats.frames_to_upstream,
+            stats.bytes_to_upstream,
+            stats.frames_to_client,
+            stats.bytes_to_client,
+        )
         await upstream.close()
         try:
-            await websocket.close()
+            await websocket.close(code=close_code)
         except Exception:
             pass
 
@@ -253,6 +1298,7 @@ async def proxy_websocket(websocket: WebSocket) -> None:
 app = Starlette(
     lifespan=lifespan,
     routes=[
+        *([Route(METRICS_PATH, metrics_endpoint, methods=["GET"])] if METRICS_PATH else []),
         Route(
             "/{path:path}",
             proxy_http,
@@ -260,4 +1306,9 @@ app = Starlette(
         ),
         WebSocketRoute("/{path:path}", proxy_websocket),
     ],
+    middleware=[
+        *([Middleware(ReadinessGateMiddleware)] if READINESS_GATE else []),
+        *([Middleware(AdmissionMiddleware)] if ADMISSION_RULES else []),
+        *([Middleware(InProcessApiMiddleware, api_app=load_inprocess_api())] if INPROCESS_API else []),
+    ],
 )
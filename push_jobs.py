@@ -0,0 +1,409 @@
+"""Durable background queue for /push-metadata.
+
+Jobs are rows in a SQLite file, so queued and interrupted pushes survive a
+restart: anything still marked running when the queue starts is put back in
+the queue. Workers retry GitHub 5xx, rate-limit, network and write-conflict
+failures with exponential backoff; any other failure is final. A running
+job's stage follows the push (state_read, branch_ready, committed,
+pr_opened), and finished jobs are deleted after PUSH_JOB_RETENTION seconds.
+
+Submitting with an Idempotency-Key returns the job already created for that
+key; without one, an identical push still waiting or running is reused.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from constants import MASADER_GH_REPO
+from github_client import GithubApiError
+from github_push import (
+    PUSH_COALESCE_SECONDS,
+    GithubPushError,
+    PushConflict,
+    PushResult,
+    push_fingerprint,
+    push_metadata_idempotent_async,
+    push_progress,
+)
+from github_scheduler import background_priority
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = Path(__file__).resolve().parent
+
+PUSH_JOBS_DB = Path(os.environ.get("PUSH_JOBS_DB", str(_APP_DIR / ".push_jobs.sqlite3")))
+PUSH_JOB_WORKERS = int(os.environ.get("PUSH_JOB_WORKERS", "2"))
+PUSH_JOB_MAX_ATTEMPTS = int(os.environ.get("PUSH_JOB_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 300.0
+# Workers also poll this often so retries whose backoff expired get picked up.
+POLL_INTERVAL = 1.0
+# Succeeded and failed jobs are kept this long for GET /jobs/{id}; 0 keeps
+# them forever.
+PUSH_JOB_RETENTION = float(os.environ.get("PUSH_JOB_RETENTION", str(7 * 24 * 3600)))
+RETENTION_SWEEP_INTERVAL = 3600.0
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+
+@dataclass
+class PushJob:
+    id: str
+    status: str
+    stage: str
+    attempts: int
+    github_username: str
+    metadata: dict
+    created_at: float
+    updated_at: float
+    result: dict | None = None
+    error: str | None = None
+    error_status: int | None = None
+    fingerprint: str | None = None
+
+    @property
+    def push_result(self) -> PushResult | None:
+        return PushResult(**self.result) if self.result is not None else None
+
+
+def retry_delay(exc: Exception, attempt: int) -> float | None:
+    """Seconds to wait before retrying ``exc``, or None if it isn't transient."""
+    cause = exc.__cause__ if isinstance(exc, GithubPushError) else exc
+    backoff = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+    backoff *= random.uniform(0.8, 1.2)
+    if isinstance(cause, httpx.TransportError) or isinstance(exc, PushConflict):
+        return backoff
+    if not isinstance(cause, GithubApiError):
+        return None
+    headers = cause.headers
+    if cause.status == 429 or (cause.status == 403 and headers.get("X-RateLimit-Remaining") == "0"):
+        if headers.get("Retry-After", "").isdigit():
+            return float(headers["Retry-After"])
+        if headers.get("X-RateLimit-Reset", "").isdigit():
+            return min(max(float(headers["X-RateLimit-Reset"]) - time.time(), 1.0), RETRY_MAX_DELAY)
+        return backoff
+    if cause.status == 403 and headers.get("Retry-After", "").isdigit():
+        # Secondary rate limit.
+        return float(headers["Retry-After"])
+    if cause.status >= 500:
+        return backoff
+    return None
+
+
+class PushJobStore:
+    def __init__(self, path: Path = PUSH_JOBS_DB):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS push_jobs ("
+                " id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " stage TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " github_username TEXT NOT NULL,"
+                " metadata TEXT NOT NULL,"
+                " result TEXT,"
+                " error TEXT,"
+                " error_status INTEGER,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " run_after REAL NOT NULL,"
+                " idempotency_key TEXT,"
+                " fingerprint TEXT)"
+            )
+            # Files written before the idempotency columns existed.
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(push_jobs)")}
+            for column in ("idempotency_key", "fingerprint"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE push_jobs ADD COLUMN {column} TEXT")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS push_jobs_queue ON push_jobs (status, run_after)"
+            )
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS push_jobs_idempotency_key"
+                " ON push_jobs (idempotency_key)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS push_jobs_fingerprint ON push_jobs (fingerprint)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._connection().execute(sql, params)
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> PushJob:
+        return PushJob(
+            id=row["id"],
+            status=row["status"],
+            stage=row["stage"],
+            attempts=row["attempts"],
+            github_username=row["github_username"],
+            metadata=json.loads(row["metadata"]),
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            error_status=row["error_status"],
+            fingerprint=row["fingerprint"],
+        )
+
+    def enqueue(
+        self, metadata: dict, github_username: str, idempotency_key: str | None = None
+    ) -> PushJob:
+        """Queue a push, or return the job already holding ``idempotency_key``
+        (without a key: an identical job that hasn't finished yet). The caller
+        compares fingerprints to catch a key reused for a different push."""
+        now = time.time()
+        fingerprint = push_fingerprint(metadata, github_username, MASADER_GH_REPO)
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if idempotency_key:
+                    row = conn.execute(
+                        "SELECT id FROM push_jobs WHERE idempotency_key = ?", (idempotency_key,)
+                    ).fetchone()
+                else:
+                    row = conn.execute(
+                        "SELECT id FROM push_jobs WHERE fingerprint = ? AND idempotency_key IS NULL"
+                        " AND status IN ('queued', 'running') ORDER BY created_at LIMIT 1",
+                        (fingerprint,),
+                    ).fetchone()
+                job_id = row["id"] if row else uuid.uuid4().hex
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO push_jobs (id, status, stage, github_username, metadata,"
+                        " created_at, updated_at, run_after, idempotency_key, fingerprint)"
+                        " VALUES (?, 'queued', 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            job_id,
+                            github_username,
+                            json.dumps(metadata),
+                            now,
+                            now,
+                            now,
+                            idempotency_key or None,
+                            fingerprint,
+                        ),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> PushJob | None:
+        row = self._execute("SELECT * FROM push_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def claim(self) -> PushJob | None:
+        """Atomically move the oldest due job to running."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM push_jobs WHERE status = 'queued' AND run_after <= ?"
+                    " ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE push_jobs SET status = 'running', stage = 'pushing',"
+                    " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (now, row["id"]),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"])
+
+    def set_stage(self, job_id: str, stage: str) -> None:
+        self._execute(
+            "UPDATE push_jobs SET stage = ?, updated_at = ? WHERE id = ? AND status = 'running'",
+            (stage, time.time(), job_id),
+        )
+
+    def next_run_after(self) -> float | None:
+        row = self._execute(
+            "SELECT MIN(run_after) FROM push_jobs WHERE status = 'queued'"
+        ).fetchone()
+        return row[0]
+
+    def succeed(self, job_id: str, result: PushResult) -> None:
+        self._execute(
+            "UPDATE push_jobs SET status = 'succeeded', stage = 'done', result = ?,"
+            " error = NULL, error_status = NULL, updated_at = ? WHERE id = ?",
+            (json.dumps(asdict(result)), time.time(), job_id),
+        )
+
+    def fail(self, job_id: str, error: str, status_code: int) -> None:
+        self._execute(
+            "UPDATE push_jobs SET status = 'failed', stage = 'done', error = ?,"
+            " error_status = ?, updated_at = ? WHERE id = ?",
+            (error, status_code, time.time(), job_id),
+        )
+
+    def retry_later(self, job_id: str, error: str, status_code: int, delay: float) -> None:
+        now = time.time()
+        self._execute(
+            "UPDATE push_jobs SET status = 'queued', stage = 'retrying', error = ?,"
+            " error_status = ?, updated_at = ?, run_after = ? WHERE id = ?",
+            (error, status_code, now, now + delay, job_id),
+        )
+
+    def requeue_interrupted(self) -> int:
+        """Put jobs a previous process was running back in the queue."""
+        cursor = self._execute(
+            "UPDATE push_jobs SET status = 'queued', stage = 'queued', updated_at = ?"
+            " WHERE status = 'running'",
+            (time.time(),),
+        )
+        return cursor.rowcount
+
+    def delete_finished(self, before: float) -> int:
+        """Delete succeeded and failed jobs last updated before ``before``."""
+        cursor = self._execute(
+            "DELETE FROM push_jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+            (before,),
+        )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._execute("SELECT status, COUNT(*) FROM push_jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+class PushJobQueue:
+    def __init__(
+        self,
+        store: PushJobStore,
+        *,
+        workers: int = PUSH_JOB_WORKERS,
+        max_attempts: int = PUSH_JOB_MAX_ATTEMPTS,
+        retention: float = PUSH_JOB_RETENTION,
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            logger.info("Re-queued %d push job(s) interrupted by a restart", requeued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.retention > 0:
+            self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self) -> None:
+        # Jobs cancelled mid-push stay "running" and are re-queued on the
+        # next start.
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(
+        self, metadata: dict, github_username: str, idempotency_key: str | None = None
+    ) -> PushJob:
+        job = self.store.enqueue(metadata, github_username, idempotency_key)
+        if job.fingerprint != push_fingerprint(metadata, github_username, MASADER_GH_REPO):
+            raise GithubPushError(
+                "Idempotency-Key was already used for a different request.", status_code=422
+            )
+        self._wakeup.set()
+        return job
+
+    async def _wait_for_work(self) -> None:
+        timeout = POLL_INTERVAL
+        run_after = self.store.next_run_after()
+        if run_after is not None:
+            timeout = min(timeout, max(run_after - time.time(), 0.0))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _worker(self) -> None:
+        while True:
+            job = self.store.claim()
+            if job is None:
+                await self._wait_for_work()
+                continue
+            await self._run(job)
+
+    async def _sweep(self) -> None:
+        while True:
+            deleted = self.store.delete_finished(time.time() - self.retention)
+            if deleted:
+                logger.info("Deleted %d finished push job(s) past retention", deleted)
+            await asyncio.sleep(RETENTION_SWEEP_INTERVAL)
+
+    async def _run(self, job: PushJob) -> None:
+        try:
+            with background_priority(), push_progress(
+                lambda stage, **details: self.store.set_stage(job.id, stage)
+            ):
+                result = await push_metadata_idempotent_async(
+                    job.metadata, job.github_username, coalesce_seconds=PUSH_COALESCE_SECONDS
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            message = exc.message if isinstance(exc, GithubPushError) else str(exc)
+            status_code = exc.status_code if isinstance(exc, GithubPushError) else 500
+            delay = retry_delay(exc, job.attempts)
+            if delay is not None and job.attempts < self.max_attempts:
+                logger.warning(
+                    "Push job %s attempt %d failed (%s); retrying in %.0fs",
+                    job.id,
+                    job.attempts,
+                    message,
+                    delay,
+                )
+                self.store.retry_later(job.id, message, status_code, delay)
+                self._wakeup.set()
+            else:
+                if not isinstance(exc, GithubPushError):
+                    logger.exception("Push job %s failed", job.id)
+                self.store.fail(job.id, message, status_code)
+            return
+        self.store.succeed(job.id, result)
+
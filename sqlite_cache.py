@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Expired rows are purged at most this often.
+PURGE_INTERVAL = 300.0
+
+
+class SqliteTTLCache:
+    """A small JSON key/value cache with per-entry TTLs in a SQLite file.
+
+    The Streamlit app, the API and the proxy (with the in-process API) each
+    open the same file, so whatever one of them learns the others reuse.
+    The cache is best effort: database errors are logged and read as misses.
+    """
+
+    def __init__(self, path: Path, namespace: str):
+        self.path = path
+        self.namespace = namespace
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=1.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Any | None:
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                    (self.namespace, key, time.time()),
+                ).fetchone()
+        except sqlite3.Error as exc:
+            logger.warning("Cache read from %s failed: %s", self.path, exc)
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value), now + ttl),
+                )
+                if now - self._last_purge > PURGE_INTERVAL:
+                    self._last_purge = now
+                    conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as exc:
+            logger.warning("Cache write to %s failed: %s", self.path, exc)
+
+    def delete(self, key: str) -> None:
+        try:
+            with self._lock:
+                self._connection().execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+                )
+        except sqlite3.Error as exc:
+            logger.warning("Cache delete in %s failed: %s", self.path, exc)
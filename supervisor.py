@@ -0,0 +1,324 @@
+"""Container entry point: runs the backends and the proxy in one supervisor.
+
+The proxy port is bound immediately and answers 503 + Retry-After on API
+routes until the API passes its health check, and on everything else until
+a Streamlit worker does, so neither a cold start (502s) nor a fixed sleep is
+needed. Once a backend is healthy the proxy's connection pool is pre-warmed
+against it, and a backend that exits is restarted with backoff while the
+others keep serving.
+
+    uv run python supervisor.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import uvicorn
+
+logger = logging.getLogger("supervisor")
+
+PROXY_PORT = int(os.environ.get("PORT", "8080"))
+API_PORT = 8001
+STREAMLIT_PORT = 8501
+
+# Backends listen on Unix domain sockets unless BACKEND_TRANSPORT=tcp.
+BACKEND_TRANSPORT = os.environ.get("BACKEND_TRANSPORT", "unix")
+SOCKET_DIR = Path(os.environ.get("SOCKET_DIR", "/tmp/masader-form"))
+INPROCESS_API = os.environ.get("PROXY_INPROCESS_API", "0") == "1"
+# Streamlit processes behind the proxy's sticky session routing.
+STREAMLIT_WORKERS = max(1, int(os.environ.get("STREAMLIT_WORKERS", "1")))
+
+HEALTH_POLL_INTERVAL = float(os.environ.get("SUPERVISOR_HEALTH_INTERVAL", "0.25"))
+STARTUP_TIMEOUT = float(os.environ.get("SUPERVISOR_STARTUP_TIMEOUT", "120"))
+PREWARM_CONNECTIONS = int(os.environ.get("SUPERVISOR_PREWARM_CONNECTIONS", "8"))
+SHUTDOWN_GRACE = 10.0
+RESTART_BACKOFF_MAX = 30.0
+# A backend that stayed up this long is considered stable again.
+STABLE_RUNTIME = 60.0
+
+STREAMLIT_FLAGS = [
+    "--server.fileWatcherType",
+    "none",
+    "--browser.gatherUsageStats",
+    "false",
+    "--client.showErrorDetails",
+    "false",
+    "--client.toolbarMode",
+    "minimal",
+    "--server.enableCORS",
+    "false",
+    "--server.enableXsrfProtection",
+    "false",
+    "--server.enableWebsocketCompression",
+    "false",
+]
+
+
+@dataclass
+class Backend:
+    name: str
+    # As the proxy sees it: http://host:port or unix:///path/to.sock
+    url: str
+    health_path: str
+    argv: List[str]
+    # Any one healthy member of a pool is enough to accept traffic.
+    pool: str | None = None
+    process: asyncio.subprocess.Process | None = None
+    healthy: bool = False
+    restarts: int = 0
+
+    @property
+    def socket_path(self) -> Path | None:
+        if self.url.startswith("unix://"):
+            return Path(self.url[len("unix://") :])
+        return None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+
+def backend_specs() -> List[Backend]:
+    python = sys.executable
+    backends = []
+    if BACKEND_TRANSPORT == "unix":
+        SOCKET_DIR.mkdir(parents=True, exist_ok=True)
+        api_url = f"unix://{SOCKET_DIR / 'api.sock'}"
+        api_bind = ["--uds", str(SOCKET_DIR / "api.sock")]
+    else:
+        api_url = f"http://127.0.0.1:{API_PORT}"
+        api_bind = ["--host", "127.0.0.1", "--port", str(API_PORT)]
+
+    if not INPROCESS_API:
+        backends.append(
+            Backend(
+                name="api",
+                url=api_url,
+                health_path="/health",
+                argv=[python, "-m", "uvicorn", "api:app", *api_bind, "--log-level", "warning"],
+            )
+        )
+    for index in range(STREAMLIT_WORKERS):
+        suffix = f"-{index}" if STREAMLIT_WORKERS > 1 else ""
+        port = STREAMLIT_PORT + index
+        if BACKEND_TRANSPORT == "unix":
+            streamlit_url = f"unix://{SOCKET_DIR / f'streamlit{suffix}.sock'}"
+            streamlit_address = streamlit_url
+        else:
+            streamlit_url = f"http://127.0.0.1:{port}"
+            streamlit_address = "127.0.0.1"
+        backends.append(
+            Backend(
+                name=f"streamlit{suffix}",
+                url=streamlit_url,
+                health_path="/_stcore/health",
+                argv=[
+                    python,
+                    "-m",
+                    "streamlit",
+                    "run",
+                    "app.py",
+                    "--server.address",
+                    streamlit_address,
+                    "--server.port",
+                    str(port),
+                    *STREAMLIT_FLAGS,
+                ],
+                pool="streamlit",
+            )
+        )
+    return backends
+
+
+class Supervisor:
+    def __init__(self, backends: List[Backend]):
+        self.backends = backends
+        self.stopping = asyncio.Event()
+        self.proxy = None
+        self.server: uvicorn.Server | None = None
+
+    def request_stop(self) -> None:
+        self.stopping.set()
+        if self.server is not None:
+            self.server.should_exit = True
+
+    def update_readiness(self) -> None:
+        # Each route ("api", "streamlit") is gated on its own backends, so a
+        # restarting API doesn't take the UI down with it and vice versa.
+        routes: Dict[str, List[Backend]] = {}
+        for backend in self.backends:
+            routes.setdefault(backend.pool or backend.name, []).append(backend)
+        readiness = self.proxy.readiness
+        for route, members in routes.items():
+            if any(backend.healthy for backend in members):
+                if readiness.reason(route) is not None:
+                    logger.info("%s healthy; proxy is accepting its traffic", route)
+                    readiness.mark_ready(route)
+            else:
+                readiness.mark_unready(route, f"waiting for {route}")
+
+    def update_worker(self, backend: Backend) -> None:
+        # Tell the proxy right away instead of waiting for its own health
+        # checks to notice.
+        worker = self.proxy.streamlit_pool.worker_for_url(backend.url)
+        if worker is not None:
+            self.proxy.streamlit_pool.set_health(worker, backend.healthy, "process exited")
+
+    async def spawn(self, backend: Backend) -> None:
+        socket_path = backend.socket_path
+        if socket_path is not None and socket_path.exists():
+            socket_path.unlink()
+        logger.info("Starting %s: %s", backend.name, " ".join(backend.argv))
+        backend.process = await asyncio.create_subprocess_exec(*backend.argv)
+
+    async def probe(self, client: httpx.AsyncClient, backend: Backend) -> bool:
+        url = f"{self.proxy.backend_base_url(backend.url)}{backend.health_path}"
+        try:
+            response = await client.get(url, timeout=2.0)
+        except httpx.HTTPError:
+            return False
+        return response.status_code == 200
+
+    async def wait_healthy(self, client: httpx.AsyncClient, backend: Backend) -> bool:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while backend.alive and not self.stopping.is_set():
+            if await self.probe(client, backend):
+                return True
+            if time.monotonic() > deadline:
+                logger.error("%s not healthy after %.0fs; restarting it", backend.name, STARTUP_TIMEOUT)
+                await self.terminate(backend)
+                return False
+            await asyncio.sleep(HEALTH_POLL_INTERVAL)
+        return False
+
+    async def prewarm(self, client: httpx.AsyncClient, backend: Backend) -> None:
+        # Concurrent requests make the pool open several keep-alive
+        # connections now instead of on the first user requests.
+        await asyncio.gather(
+            *(self.probe(client, backend) for _ in range(PREWARM_CONNECTIONS)),
+            return_exceptions=True,
+        )
+
+    async def keep_alive(self, backend: Backend) -> None:
+        client: httpx.AsyncClient = self.proxy.app.state.http
+        backoff = 1.0
+        while not self.stopping.is_set():
+            started = time.monotonic()
+            await self.spawn(backend)
+            if await self.wait_healthy(client, backend):
+                await self.prewarm(client, backend)
+                backend.healthy = True
+                logger.info("%s is healthy after %.1fs", backend.name, time.monotonic() - started)
+                self.update_worker(backend)
+                self.update_readiness()
+
+            returncode = await backend.process.wait()
+            backend.healthy = False
+            if self.stopping.is_set():
+                return
+            self.update_worker(backend)
+            self.update_readiness()
+
+            if time.monotonic() - started > STABLE_RUNTIME:
+                backoff = 1.0
+            backend.restarts += 1
+            logger.error(
+                "%s exited with code %s; restart #%d in %.0fs",
+                backend.name,
+                returncode,
+                backend.restarts,
+                backoff,
+            )
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=backoff)
+                return
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+
+    async def terminate(self, backend: Backend) -> None:
+        process = backend.process
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=SHUTDOWN_GRACE)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def run(self) -> None:
+        # proxy reads its backend URLs at import time.
+        os.environ["PROXY_READINESS_GATE"] = "1"
+        urls: Dict[str, str] = {backend.name: backend.url for backend in self.backends}
+        if "api" in urls:
+            os.environ["API_BACKEND"] = urls["api"]
+        os.environ["STREAMLIT_BACKEND"] = ",".join(
+            backend.url for backend in self.backends if backend.pool == "streamlit"
+        )
+        import proxy
+
+        self.proxy = proxy
+        # Workers join the pool as they pass their first health check.
+        for worker in proxy.streamlit_pool.workers:
+            worker.healthy = False
+        self.server = uvicorn.Server(
+            uvicorn.Config(
+                proxy.app,
+                host="0.0.0.0",
+                port=PROXY_PORT,
+                log_level="warning",
+                access_log=False,
+            )
+        )
+        serving = asyncio.create_task(self.server.serve())
+        while not self.server.started and not serving.done():
+            await asyncio.sleep(0.05)
+        if serving.done():
+            serving.result()
+            return
+
+        watchers = [asyncio.create_task(self.keep_alive(backend)) for backend in self.backends]
+        try:
+            await serving
+        finally:
+            self.stopping.set()
+            await asyncio.gather(*(self.terminate(backend) for backend in self.backends))
+            for task in watchers:
+                task.cancel()
+            await asyncio.gather(*watchers, return_exceptions=True)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    # Every proxied request and health probe would otherwise be logged.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async def run() -> None:
+        loop = asyncio.get_running_loop()
+        supervisor = Supervisor(backend_specs())
+
+        # uvicorn swaps in its own handlers while serving and re-raises the
+        # signal afterwards; this one turns that into a clean shutdown.
+        def on_signal(signum, frame) -> None:
+            loop.call_soon_threadsafe(supervisor.request_stop)
+
+        signal.signal(signal.SIGTERM, on_signal)
+        signal.signal(signal.SIGINT, on_signal)
+        await supervisor.run()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import api
+
+
+def test_prefer_respond_async():
+    assert api.wants_async("respond-async")
+    assert api.wants_async("return=minimal, respond-async")
+    assert not api.wants_async("return=minimal")
+    assert not api.wants_async(None)
+
+
+def test_async_by_default_ignores_other_preferences(monkeypatch):
+    monkeypatch.setattr(api, "PUSH_METADATA_ASYNC", True)
+    assert api.wants_async(None)
+    assert api.wants_async("return=minimal")
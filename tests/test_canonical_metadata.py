@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import github_push
+from github_push import canonical_metadata_json, git_blob_sha
+
+
+def test_card_order_applies_to_nested_objects():
+    metadata = {
+        "Year": 2020,
+        "Subsets": [{"Unit": "sentences", "Volume": 10, "Name": "A", "Dialect": "Jordan", "x": 1}],
+        "Name": "Test",
+        "annotations_from_paper": {"b": 1, "a": 0},
+    }
+    written = json.loads(canonical_metadata_json(metadata))
+    assert list(written) == ["Name", "Subsets", "Year", "annotations_from_paper"]
+    assert list(written["Subsets"][0]) == ["Name", "Dialect", "Volume", "Unit", "x"]
+    assert list(written["annotations_from_paper"]) == ["a", "b"]
+
+
+class FakeGithub:
+    """Answers the state query with a branch holding ``stored``; any write
+    fails the test."""
+
+    def __init__(self, stored: dict):
+        self.oid = git_blob_sha(canonical_metadata_json(stored))
+
+    async def graphql(self, query, variables, *, token):
+        return {
+            "repository": {
+                "defaultBranchRef": {"name": "main", "target": {"oid": "base"}},
+                "branch": {
+                    "target": {"oid": "head"},
+                    "associatedPullRequests": {"nodes": []},
+                },
+                "branchFile": {"oid": self.oid},
+                "baseFile": None,
+            }
+        }
+
+    async def request(self, method, path, **kwargs):
+        raise AssertionError(f"unexpected {method} {path}")
+
+
+def test_nested_key_order_alone_is_unchanged():
+    stored = {
+        "Name": "Test",
+        "Subsets": [{"Name": "A", "Dialect": "Syria", "Volume": 1, "Unit": "tokens"}],
+    }
+    edited = {
+        "Subsets": [{"Unit": "tokens", "Volume": 1, "Name": "A", "Dialect": "Syria"}],
+        "Name": "Test",
+    }
+    result = asyncio.run(
+        github_push._push(
+            FakeGithub(stored),
+            "owner/repo",
+            "token",
+            edited,
+            author={"name": "n", "email": "e"},
+            branch_name="add-test",
+            file_path="datasets/test.json",
+            pr_title="t",
+            pr_body="b",
+        )
+    )
+    assert result.status == "unchanged"
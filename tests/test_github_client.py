@@ -0,0 +1,36 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+
+from github_client import GithubClient
+
+
+def test_304_replays_gzipped_response():
+    body = gzip.compress(json.dumps({"login": "alice"}).encode())
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(
+            200, headers={"ETag": '"v1"', "Content-Encoding": "gzip"}, content=body
+        )
+
+    async def run():
+        client = GithubClient(base_url="https://github.test")
+        client.http = httpx.AsyncClient(
+            base_url="https://github.test", transport=httpx.MockTransport(handler)
+        )
+        try:
+            first = await client.get_json("/users/alice", token="t")
+            second = await client.get_json("/users/alice", token="t")
+        finally:
+            await client.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {"login": "alice"}
+    assert seen == [None, '"v1"']
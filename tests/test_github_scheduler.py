@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+from github_scheduler import INTERACTIVE, RateLimit, RateLimitScheduler, token_key
+
+
+def test_low_budget_spaces_concurrent_calls_out():
+    async def run():
+        scheduler = RateLimitScheduler(max_concurrency=8)
+        # 3 calls left for the next 0.3s: one every 0.1s.
+        scheduler._budgets[(token_key("t"), "core")] = RateLimit(
+            limit=100, remaining=3, reset=time.time() + 0.3
+        )
+        started = time.monotonic()
+        sent = []
+
+        async def call():
+            async with scheduler.slot("t", "core"):
+                sent.append(time.monotonic() - started)
+
+        await asyncio.gather(*(call() for _ in range(3)))
+        return sorted(sent)
+
+    sent = asyncio.run(run())
+    assert sent[0] < 0.05
+    assert sent[1] - sent[0] >= 0.08
+    assert sent[2] - sent[1] >= 0.08
+
+
+def test_healthy_budget_does_not_delay():
+    scheduler = RateLimitScheduler()
+    scheduler._budgets[(token_key("t"), "core")] = RateLimit(
+        limit=100, remaining=90, reset=time.time() + 60
+    )
+    assert scheduler.delay("t", "core", INTERACTIVE) == 0.0
@@ -0,0 +1,38 @@
+from starlette.requests import HTTPConnection
+
+import proxy
+
+
+def connection(headers, peer="10.0.0.1"):
+    scope = {
+        "type": "http",
+        "path": "/push-metadata",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": (peer, 1234),
+    }
+    return HTTPConnection(scope)
+
+
+def test_unknown_api_keys_share_the_ip_bucket(monkeypatch):
+    monkeypatch.setenv("API_KEY", "secret")
+    keys = {
+        proxy.admission_key(connection({"X-API-Key": f"bogus-{i}"}), "api_key") for i in range(5)
+    }
+    assert len(keys) == 1
+    assert keys.pop().startswith("ip:")
+    assert proxy.admission_key(connection({"X-API-Key": "secret"}), "api_key").startswith("key:")
+
+
+def test_api_key_ignored_when_none_configured(monkeypatch):
+    monkeypatch.delenv("API_KEY", raising=False)
+    assert proxy.admission_key(connection({"X-API-Key": "anything"}), "api_key") == "ip:10.0.0.1"
+
+
+def test_client_address_uses_trusted_hop(monkeypatch):
+    monkeypatch.setattr(proxy, "TRUSTED_PROXY_HOPS", 1)
+    spoofed = connection({"X-Forwarded-For": "1.2.3.4, 203.0.113.7"})
+    assert proxy.client_address(spoofed) == "203.0.113.7"
+    monkeypatch.setattr(proxy, "TRUSTED_PROXY_HOPS", 2)
+    assert proxy.client_address(spoofed) == "1.2.3.4"
+    monkeypatch.setattr(proxy, "TRUSTED_PROXY_HOPS", 0)
+    assert proxy.client_address(spoofed) == "10.0.0.1"
@@ -0,0 +1,32 @@
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+import metrics
+import proxy
+from worker_pool import WorkerPool
+
+
+def test_metrics_label_follows_routing_when_backends_share_a_url(monkeypatch):
+    backend = "http://127.0.0.1:9999"
+    monkeypatch.setattr(proxy, "PRECOMPRESS_ASSETS", False)
+    monkeypatch.setattr(proxy, "API_BACKEND", backend)
+    monkeypatch.setattr(proxy, "streamlit_pool", WorkerPool([backend]))
+
+    def handler(request):
+        return httpx.Response(200, content=b"ok")
+
+    with TestClient(proxy.app) as client:
+        proxy.app.state.http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        before = dict(proxy.UPSTREAM_RESPONSES._values)
+        assert client.get("/jobs/abc").status_code == 200
+        assert client.get("/").status_code == 200
+        after = proxy.UPSTREAM_RESPONSES._values
+
+    for label in ("api", "streamlit"):
+        assert after[(label, "200")] - before.get((label, "200"), 0) == 1
+
+
+def test_metric_requires_samples():
+    with pytest.raises(TypeError):
+        metrics.Metric("m", "doc")
@@ -0,0 +1,47 @@
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import proxy
+
+
+def ok(request):
+    return PlainTextResponse("ok")
+
+
+def client(monkeypatch, readiness):
+    monkeypatch.setattr(proxy, "readiness", readiness)
+    app = Starlette(
+        routes=[Route("/{path:path}", ok)],
+        middleware=[Middleware(proxy.ReadinessGateMiddleware)],
+    )
+    return TestClient(app)
+
+
+def test_api_restart_only_gates_api_routes(monkeypatch):
+    readiness = proxy.Readiness(["api", "streamlit"])
+    readiness.mark_ready("streamlit")
+    readiness.mark_unready("api", "waiting for api")
+    http = client(monkeypatch, readiness)
+
+    response = http.post("/push-metadata")
+    assert response.status_code == 503
+    assert "waiting for api" in response.text
+    assert response.headers["Retry-After"]
+    assert http.get("/").status_code == 200
+    assert http.get("/_stcore/health").status_code == 200
+
+
+def test_streamlit_down_keeps_api_serving(monkeypatch):
+    readiness = proxy.Readiness(["api", "streamlit"])
+    readiness.mark_ready("api")
+    http = client(monkeypatch, readiness)
+
+    assert http.get("/").status_code == 503
+    assert http.get("/jobs/abc").status_code == 200
+
+    readiness.mark_ready("streamlit")
+    assert readiness.ready
+    assert http.get("/").status_code == 200
@@ -0,0 +1,49 @@
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+import proxy
+
+BIG = b"x" * 4096
+
+
+@pytest.fixture
+def upstream_hits(monkeypatch):
+    monkeypatch.setattr(proxy, "PRECOMPRESS_ASSETS", False)
+    monkeypatch.setattr(proxy, "STATIC_CACHE_MAX_ENTRY_BYTES", 1024)
+    hits = []
+
+    async def chunked(body):
+        for start in range(0, len(body), 512):
+            yield body[start : start + 512]
+
+    def handler(request):
+        hits.append(request.url.path)
+        headers = {"Cache-Control": "public, max-age=31536000"}
+        # Streamed bodies, like a real backend connection.
+        if request.url.path == "/static/js/small.js":
+            headers["Content-Length"] = "5"
+            return httpx.Response(200, headers=headers, content=chunked(b"small"))
+        if request.url.path == "/static/js/sized.js":
+            headers["Content-Length"] = str(len(BIG))
+        return httpx.Response(200, headers=headers, content=chunked(BIG))
+
+    with TestClient(proxy.app) as client:
+        proxy.app.state.http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        yield client, hits
+
+
+@pytest.mark.parametrize("path", ["/static/js/chunked.js", "/static/js/sized.js"])
+def test_uncacheable_assets_are_fetched_once_per_request(upstream_hits, path):
+    client, hits = upstream_hits
+    for _ in range(3):
+        response = client.get(path, headers={"Accept-Encoding": "identity"})
+        assert response.content == BIG
+    assert hits == [path] * 3
+
+
+def test_small_assets_are_served_from_cache(upstream_hits):
+    client, hits = upstream_hits
+    for _ in range(3):
+        assert client.get("/static/js/small.js").content == b"small"
+    assert hits == ["/static/js/small.js"]
@@ -0,0 +1,30 @@
+from starlette.requests import HTTPConnection
+
+import proxy
+from worker_pool import WorkerPool
+
+
+def connection(kind, peer, headers=()):
+    return HTTPConnection(
+        {
+            "type": kind,
+            "path": "/_stcore/stream" if kind == "websocket" else "/_stcore/upload_file/abc",
+            "headers": [(name.encode(), value.encode()) for name, value in headers],
+            "client": (peer, 1234),
+        }
+    )
+
+
+def test_cookieless_http_and_websocket_share_a_worker():
+    pool = WorkerPool(["http://w0", "http://w1", "http://w2"])
+    for i in range(20):
+        peer = f"10.0.0.{i}"
+        http_key, cookie = proxy.sticky_session_key(connection("http", peer))
+        ws_key, _ = proxy.sticky_session_key(connection("websocket", peer))
+        assert pool.pick(http_key) is pool.pick(ws_key)
+        # Once the cookie comes back it keeps routing to the same worker.
+        cookie_key, new = proxy.sticky_session_key(
+            connection("websocket", "10.9.9.9", [("cookie", f"{proxy.STICKY_COOKIE}={cookie}")])
+        )
+        assert new is None
+        assert pool.pick(cookie_key) is pool.pick(http_key)
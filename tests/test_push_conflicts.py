@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import github_push
+from github_client import GithubApiError
+from github_push import GithubPushError, PushConflict
+
+
+class FakeGithub:
+    """A new branch with no file yet, where the listed writes fail."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+
+    async def graphql(self, query, variables, *, token):
+        return {
+            "repository": {
+                "defaultBranchRef": {"name": "main", "target": {"oid": "base"}},
+                "branch": None,
+                "branchFile": None,
+                "baseFile": None,
+            }
+        }
+
+    async def request(self, method, path, **kwargs):
+        self.calls.append((method, path))
+        for (fail_method, fail_path), status in self.failures.items():
+            if method == fail_method and path.endswith(fail_path):
+                raise GithubApiError(status, "Validation Failed")
+        return FakeResponse()
+
+
+class FakeResponse:
+    def json(self):
+        return {"html_url": "https://pr"}
+
+
+def push(client):
+    return github_push.retry_conflicts(
+        lambda: github_push._push(
+            client,
+            "owner/repo",
+            "token",
+            {"Name": "Test"},
+            author={"name": "n", "email": "e"},
+            branch_name="add-test",
+            file_path="datasets/test.json",
+            pr_title="t",
+            pr_body="b",
+        ),
+        what="add-test",
+        retries=2,
+    )
+
+
+def test_pull_request_422_is_reported_not_retried(monkeypatch):
+    monkeypatch.setattr(github_push, "WRITE_STRATEGY", "rest")
+    client = FakeGithub({("POST", "/pulls"): 422})
+    with pytest.raises(GithubPushError) as excinfo:
+        asyncio.run(push(client))
+    assert not isinstance(excinfo.value, PushConflict)
+    assert "Could not create pull request" in excinfo.value.message
+    assert [call for call in client.calls if call[0] == "POST" and call[1].endswith("/pulls")] == [
+        ("POST", "/repos/owner/repo/pulls")
+    ]
+
+
+def test_branch_race_is_a_conflict(monkeypatch):
+    monkeypatch.setattr(github_push, "WRITE_STRATEGY", "rest")
+    sleep = asyncio.sleep
+    monkeypatch.setattr(github_push.asyncio, "sleep", lambda delay: sleep(0))
+    client = FakeGithub({("POST", "/git/refs"): 422})
+    with pytest.raises(PushConflict):
+        asyncio.run(push(client))
+    assert client.calls.count(("POST", "/repos/owner/repo/git/refs")) == 3
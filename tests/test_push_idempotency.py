@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import github_push
+from github_push import PushResult, push_metadata_idempotent_async
+from sqlite_cache import SqliteTTLCache
+
+
+@pytest.fixture
+def pushes(tmp_path, monkeypatch):
+    """Record pushed contents instead of talking to GitHub."""
+    pushed = []
+
+    async def fake_push(metadata, github_username, *, window, repo_name):
+        pushed.append(metadata["Year"])
+        await asyncio.sleep(0.01)
+        return PushResult(status="updated", branch="add-ds", message=str(metadata["Year"]))
+
+    monkeypatch.setattr(github_push, "push_metadata_coalesced_async", fake_push)
+    monkeypatch.setattr(github_push, "_push_results", SqliteTTLCache(tmp_path / "c.sqlite3", "t"))
+    return pushed
+
+
+def metadata(year):
+    return {"Name": "DS", "Year": year}
+
+
+def test_reverting_edit_is_pushed_again(pushes):
+    async def run():
+        results = []
+        for year in (1, 2, 1):
+            results.append(await push_metadata_idempotent_async(metadata(year), "alice"))
+        return results
+
+    results = asyncio.run(run())
+    assert pushes == [1, 2, 1]
+    assert [result.message for result in results] == ["1", "2", "1"]
+
+
+def test_identical_concurrent_pushes_share_one(pushes):
+    async def run():
+        return await asyncio.gather(
+            *(push_metadata_idempotent_async(metadata(1), "alice") for _ in range(3))
+        )
+
+    results = asyncio.run(run())
+    assert pushes == [1]
+    assert len(results) == 3
+
+
+def test_explicit_key_replays_and_rejects_other_bodies(pushes):
+    async def run():
+        first = await push_metadata_idempotent_async(metadata(1), "alice", idempotency_key="k")
+        again = await push_metadata_idempotent_async(metadata(1), "alice", idempotency_key="k")
+        with pytest.raises(github_push.GithubPushError) as excinfo:
+            await push_metadata_idempotent_async(metadata(2), "alice", idempotency_key="k")
+        return first, again, excinfo.value
+
+    first, again, error = asyncio.run(run())
+    assert pushes == [1]
+    assert again == first
+    assert error.status_code == 422
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+import push_jobs
+from github_push import GithubPushError, PushResult, report_progress
+
+
+def test_running_job_reports_push_stages(tmp_path, monkeypatch):
+    store = push_jobs.PushJobStore(tmp_path / "jobs.sqlite3")
+    seen = []
+
+    async def fake_push(metadata, github_username, **kwargs):
+        for stage in ("state_read", "branch_ready", "committed"):
+            report_progress(stage)
+            seen.append(store.get(job.id).stage)
+        return PushResult(status="created", branch="add-x", pull_request_url="https://pr")
+
+    monkeypatch.setattr(push_jobs, "push_metadata_idempotent_async", fake_push)
+    job = store.enqueue({"Name": "x"}, "someone")
+    claimed = store.claim()
+
+    async def run():
+        await push_jobs.PushJobQueue(store)._run(claimed)
+
+    asyncio.run(run())
+
+    assert seen == ["state_read", "branch_ready", "committed"]
+    finished = store.get(job.id)
+    assert (finished.status, finished.stage) == ("succeeded", "done")
+
+
+def test_finished_jobs_are_deleted_after_retention(tmp_path):
+    store = push_jobs.PushJobStore(tmp_path / "jobs.sqlite3")
+    done = store.enqueue({"Name": "a"}, "someone")
+    store.claim()
+    store.succeed(done.id, PushResult(status="unchanged", branch="add-a"))
+    queued = store.enqueue({"Name": "b"}, "someone")
+
+    assert store.delete_finished(time.time() - 60) == 0
+    assert store.delete_finished(time.time() + 1) == 1
+    assert store.get(done.id) is None
+    assert store.get(queued.id) is not None
+
+
+def test_idempotency_key_returns_the_original_job(tmp_path):
+    async def run():
+        queue = push_jobs.PushJobQueue(push_jobs.PushJobStore(tmp_path / "jobs.sqlite3"))
+        first = queue.submit({"Name": "a", "Year": 1}, "someone", "retry-me")
+        queue.store.claim()
+        queue.store.succeed(first.id, PushResult(status="created", branch="add-a"))
+        again = queue.submit({"Name": "a", "Year": 1}, "someone", "retry-me")
+        assert again.id == first.id
+        assert again.status == "succeeded"
+        with pytest.raises(GithubPushError) as excinfo:
+            queue.submit({"Name": "a", "Year": 2}, "someone", "retry-me")
+        assert excinfo.value.status_code == 422
+
+    asyncio.run(run())
+
+
+def test_identical_push_without_key_reuses_only_unfinished_job(tmp_path):
+    store = push_jobs.PushJobStore(tmp_path / "jobs.sqlite3")
+    first = store.enqueue({"Name": "a"}, "someone")
+    assert store.enqueue({"Name": "a"}, "someone").id == first.id
+    assert store.enqueue({"Name": "a", "Year": 1}, "someone").id != first.id
+
+    store.claim()
+    store.succeed(first.id, PushResult(status="created", branch="add-a"))
+    assert store.enqueue({"Name": "a"}, "someone").id != first.id
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Worker:
+    index: int
+    url: str
+    healthy: bool = True
+    # WebSocket sessions routed here since startup.
+    sessions: int = 0
+
+    @property
+    def label(self) -> str:
+        return str(self.index)
+
+
+class WorkerPool:
+    """Streamlit workers behind the proxy, picked by rendezvous hashing.
+
+    Each session key keeps mapping to the same worker while that worker is
+    healthy. When a worker goes down only its own sessions move, and they
+    move back once it recovers.
+    """
+
+    def __init__(self, urls: List[str]):
+        if not urls:
+            raise ValueError("WorkerPool needs at least one worker")
+        self.workers = [Worker(index, url) for index, url in enumerate(urls)]
+
+    def __len__(self) -> int:
+        return len(self.workers)
+
+    @property
+    def healthy(self) -> List[Worker]:
+        return [worker for worker in self.workers if worker.healthy]
+
+    def worker_for_url(self, url: str) -> Worker | None:
+        for worker in self.workers:
+            if worker.url == url:
+                return worker
+        return None
+
+    @staticmethod
+    def _score(key: str, worker: Worker) -> int:
+        digest = hashlib.blake2b(f"{key}\0{worker.url}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def pick(self, key: str) -> Worker:
+        if len(self.workers) == 1:
+            return self.workers[0]
+        # With every worker down, keep hashing over all of them so the
+        # request fails fast with a 502 instead of piling onto one worker.
+        candidates = self.healthy or self.workers
+        return max(candidates, key=lambda worker: self._score(key, worker))
+
+    def set_health(self, worker: Worker, healthy: bool, reason: str = "") -> None:
+        if worker.healthy == healthy:
+            return
+        worker.healthy = healthy
+        if healthy:
+            logger.info("Streamlit worker %s (%s) is healthy again", worker.label, worker.url)
+        else:
+            logger.warning(
+                "Draining Streamlit worker %s (%s)%s",
+                worker.label,
+                worker.url,
+                f": {reason}" if reason else "",
+            )
+
+    async def check(self, probe: Callable[[Worker], Awaitable[bool]]) -> None:
+        results = await asyncio.gather(
+            *(probe(worker) for worker in self.workers), return_exceptions=True
+        )
+        for worker, result in zip(self.workers, results):
+            self.set_health(worker, result is True, "health check failed")
+
+    async def run_health_checks(
+        self, probe: Callable[[Worker], Awaitable[bool]], interval: float
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check(probe)
+            except Exception:
+                logger.exception("Streamlit worker health check failed")
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, Union
+
+logger = logging.getLogger(__name__)
+
+Frame = Union[str, bytes]
+
+# What to do when the browser reads slower than the backend writes:
+# "pause" stops reading from the backend until the buffer drains (TCP
+# backpressure then reaches the backend), "close" drops the connection.
+SLOW_CONSUMER_POLICIES = ("pause", "close")
+
+# RFC 6455 "Try Again Later", used for both shedding and the connection cap.
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class RelayClosed(Exception):
+    pass
+
+
+class SlowConsumer(Exception):
+    pass
+
+
+class RelayBuffer:
+    """Bounded FIFO of frames, limited by both frame count and total bytes.
+
+    A single frame larger than ``max_bytes`` is still accepted when the buffer
+    is empty so oversized messages cannot deadlock the relay.
+    """
+
+    def __init__(self, max_frames: int, max_bytes: int):
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._frames: Deque[Frame] = deque()
+        self._closed = False
+        self._changed = asyncio.Condition()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def _has_room(self, size: int) -> bool:
+        if not self._frames:
+            return True
+        return len(self._frames) < self.max_frames and self.bytes + size <= self.max_bytes
+
+    async def put(self, frame: Frame, *, block: bool = True) -> None:
+        size = len(frame)
+        async with self._changed:
+            while not self._has_room(size):
+                if self._closed:
+                    raise RelayClosed()
+                if not block:
+                    raise SlowConsumer()
+                await self._changed.wait()
+            if self._closed:
+                raise RelayClosed()
+            self._frames.append(frame)
+            self.bytes += size
+            self._changed.notify_all()
+
+    async def get(self) -> Frame | None:
+        """Next frame, or None once the buffer is closed and drained."""
+        async with self._changed:
+            while not self._frames:
+                if self._closed:
+                    return None
+                await self._changed.wait()
+            frame = self._frames.popleft()
+            self.bytes -= len(frame)
+            self._changed.notify_all()
+            return frame
+
+    async def close(self) -> None:
+        async with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+
+TRAFFIC_FIELDS = ("frames_to_upstream", "bytes_to_upstream", "frames_to_client", "bytes_to_client")
+
+
+@dataclass
+class RelayStats:
+    target: str
+    started_at: float = field(default_factory=time.monotonic)
+    frames_to_upstream: int = 0
+    bytes_to_upstream: int = 0
+    frames_to_client: int = 0
+    bytes_to_client: int = 0
+    close_reason: str | None = None
+
+    @property
+    def duration(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+class RelayRegistry:
+    """Process-wide bookkeeping for open relays, including the global cap."""
+
+    def __init__(self, max_connections: int = 0):
+        self.max_connections = max_connections
+        self.active: Dict[int, RelayStats] = {}
+        self.total = 0
+        self.rejected = 0
+        self.shed = 0
+        self.closed_traffic: Dict[str, int] = dict.fromkeys(TRAFFIC_FIELDS, 0)
+        self._next_id = 0
+
+    def try_acquire(self, target: str) -> int | None:
+        if self.max_connections and len(self.active) >= self.max_connections:
+            self.rejected += 1
+            return None
+        self._next_id += 1
+        self.total += 1
+        self.active[self._next_id] = RelayStats(target=target)
+        return self._next_id
+
+    def release(self, relay_id: int) -> RelayStats | None:
+        stats = self.active.pop(relay_id, None)
+        if stats is None:
+            return None
+        if stats.close_reason == "slow_consumer":
+            self.shed += 1
+        for name in TRAFFIC_FIELDS:
+            self.closed_traffic[name] += getattr(stats, name)
+        return stats
+
+    def traffic(self) -> Dict[str, int]:
+        """Frame and byte totals over closed and still-open relays."""
+        totals = dict(self.closed_traffic)
+        for stats in self.active.values():
+            for name in TRAFFIC_FIELDS:
+                totals[name] += getattr(stats, name)
+        return totals
+
+
+async def _pump_in(
+    receive: Callable[[], Awaitable[Frame | None]],
+    buffer: RelayBuffer,
+    block: bool,
+) -> None:
+    try:
+        while True:
+            frame = await receive()
+            if frame is None:
+                break
+            await buffer.put(frame, block=block)
+    except RelayClosed:
+        pass
+    finally:
+        await buffer.close()
+
+
+async def _pump_out(
+    buffer: RelayBuffer,
+    send: Callable[[Frame], Awaitable[None]],
+    count: Callable[[Frame], None],
+) -> None:
+    while True:
+        frame = await buffer.get()
+        if frame is None:
+            return
+        await send(frame)
+        count(frame)
+
+
+async def _pipe(
+    receive: Callable[[], Awaitable[Frame | None]],
+    send: Callable[[Frame], Awaitable[None]],
+    buffer: RelayBuffer,
+    count: Callable[[Frame], None],
+    block: bool,
+) -> None:
+    """Move frames from one peer to the other through ``buffer``.
+
+    Returns once the sender has flushed everything the receiver produced, or
+    as soon as sending fails. A slow consumer under the "close" policy
+    surfaces as SlowConsumer.
+    """
+    reader = asyncio.create_task(_pump_in(receive, buffer, block))
+    writer = asyncio.create_task(_pump_out(buffer, send, count))
+    try:
+        done, _ = await asyncio.wait({reader, writer}, return_when=asyncio.FIRST_COMPLETED)
+        if reader in done:
+            reader.result()
+            await writer
+            return
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        writer.result()
+    finally:
+        for task in (reader, writer):
+            task.cancel()
+        await buffer.close()
+
+
+async def relay(
+    stats: RelayStats,
+    *,
+    receive_client: Callable[[], Awaitable[Frame | None]],
+    send_client: Callable[[Frame], Awaitable[None]],
+    receive_upstream: Callable[[], Awaitable[Frame | None]],
+    send_upstream: Callable[[Frame], Awaitable[None]],
+    buffer_frames: int,
+    buffer_bytes: int,
+    slow_consumer_policy: str = "pause",
+) -> None:
+    """Relay frames both ways until either side closes.
+
+    ``receive_*`` callables return None on a clean close. Only the
+    backend-to-browser direction applies ``slow_consumer_policy``; a busy
+    backend always just pauses the browser.
+    """
+
+    def to_upstream(frame: Frame) -> None:
+        stats.frames_to_upstream += 1
+        stats.bytes_to_upstream += len(frame)
+
+    def to_client(frame: Frame) -> None:
+        stats.frames_to_client += 1
+        stats.bytes_to_client += len(frame)
+
+    pipes = [
+        asyncio.create_task(
+            _pipe(
+                receive_client,
+                send_upstream,
+                RelayBuffer(buffer_frames, buffer_bytes),
+                to_upstream,
+                block=True,
+            )
+        ),
+        asyncio.create_task(
+            _pipe(
+                receive_upstream,
+                send_client,
+                RelayBuffer(buffer_frames, buffer_bytes),
+                to_client,
+                block=slow_consumer_policy != "close",
+            )
+        ),
+    ]
+    try:
+        done, _ = await asyncio.wait(pipes, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            exc = task.exception()
+            if isinstance(exc, SlowConsumer):
+                stats.close_reason = "slow_consumer"
+                raise exc
+            if exc is not None:
+                stats.close_reason = "error"
+                logger.debug("WebSocket relay for %s ended with %r", stats.target, exc)
+        if stats.close_reason is None:
+            stats.close_reason = "client" if pipes[0] in done else "upstream"
+    finally:
+        for task in pipes:
+            task.cancel()
+        await asyncio.gather(*pipes, return_exceptions=True)